@@ -3,12 +3,48 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import asyncio
+import functools
+import io
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import timeit
 import unittest
 
 import isolation
+import agents
+import analyze
+import competition_agent
+import engine
+import eval_cache
+import evaluator
 import game_agent
+import perft
+import results_store
+import sample_players
+import scheduler
+import selfplay
+import time_sweep
+import tournament
+import tune
+import work_queue
+
+import numpy as np
 
 from importlib import reload
+from isolation import batch, bitboard, features
+from isolation.geometry import (CALIBRATED_MOVES, calibrate,
+                                calibrate_average_moves, geometry)
+
+
+def timer(time_limit):
+    """Return a `time_left` callable in the same format as `Board.play()`. """
+    start = timeit.default_timer()
+    return lambda: time_limit - 1000 * (timeit.default_timer() - start)
 
 
 class IsolationTest(unittest.TestCase):
@@ -21,5 +57,782 @@ class IsolationTest(unittest.TestCase):
         self.game = isolation.Board(self.player1, self.player2)
 
 
+class PerftTest(unittest.TestCase):
+    """Check move generation against the stored perft reference counts"""
+
+    def test_reference_counts(self):
+        for name, backend in perft.BACKENDS.items():
+            for position, count, expected, _ in perft.run(
+                    backend, perft.POSITIONS, 3):
+                self.assertEqual(count, expected, (name, position.name))
+
+
+class PlayFastTest(unittest.TestCase):
+    """Check the headless play loop against the refereed one"""
+
+    def test_history_replays_to_final_position(self):
+        player1 = sample_players.RandomPlayer()
+        player2 = sample_players.GreedyPlayer()
+        game = isolation.Board(player1, player2)
+        winner, history, outcome = game.play_fast()
+
+        replay = isolation.Board(player1, player2)
+        for idx in history:
+            move = (idx % replay.height, idx // replay.height)
+            self.assertIn(move, replay.get_legal_moves())
+            replay.apply_move(move)
+        self.assertEqual(replay.to_string(), game.to_string())
+        self.assertEqual(outcome, "illegal move")
+        self.assertIs(winner, replay.inactive_player)
+        self.assertFalse(replay.get_legal_moves())
+
+
+class MobilityTest(unittest.TestCase):
+    """Check Board.mobility() against the legal moves and undo_move()"""
+
+    def test_mobility_and_undo(self):
+        rng = random.Random(11)
+        game = isolation.Board("Player1", "Player2")
+        positions = []
+        while True:
+            for player in ("Player1", "Player2"):
+                self.assertEqual(game.mobility(player),
+                                 len(game.get_legal_moves(player)))
+            positions.append((game.to_string(), game.hash()))
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        for position in reversed(positions[:-1]):
+            game.undo_move()
+            self.assertEqual((game.to_string(), game.hash()), position)
+        self.assertEqual(game.mobility(), 49)
+
+
+class SerializationTest(unittest.TestCase):
+    """Check that to_bytes() and to_string() round-trip every position"""
+
+    def test_round_trip(self):
+        rng = random.Random(3)
+        game = isolation.Board("Player1", "Player2", width=8, height=5)
+        while True:
+            for copy in (isolation.Board.from_bytes(game.to_bytes()),
+                         isolation.Board.from_string(game.to_string())):
+                self.assertEqual(copy.to_string(), game.to_string())
+                self.assertEqual(copy.active_player, game.active_player)
+                self.assertEqual(copy.move_count, game.move_count)
+                self.assertEqual(copy.mobility(), game.mobility())
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+
+
+class SearchTestCase(unittest.TestCase):
+    """Base class for the tests that search the same early position with an
+    alpha-beta player scoring with improved_score"""
+
+    def setUp(self):
+        self.game = isolation.Board("Player1", "Player2")
+        for move in [(3, 3), (2, 2), (1, 4), (4, 0)]:
+            self.game.apply_move(move)
+        self.player = game_agent.AlphaBetaPlayer(
+            score_fn=sample_players.improved_score)
+        self.player.time_left = lambda: float("inf")
+
+
+class SelectiveSearchTest(SearchTestCase):
+    """Check that each selective search option is used and counted"""
+
+    def test_options_are_counted(self):
+        game = self.game
+        for option, counter in [("extend_forced", "extensions"),
+                                ("late_move_reductions", "reductions"),
+                                ("futility_margin", "futility_prunes")]:
+            player = game_agent.AlphaBetaPlayer(
+                score_fn=sample_players.improved_score,
+                **{option: 1. if option == "futility_margin" else True})
+            player.time_left = lambda: float("inf")
+            move = player.alphabeta(game, 6)
+            self.assertIn(move, game.get_legal_moves())
+            self.assertGreater(getattr(player.stats, counter), 0, option)
+
+
+class AnalyzeTest(SearchTestCase):
+    """Check the ranked root moves reported by AlphaBetaPlayer.analyze()"""
+
+    def test_lines_match_search(self):
+        game, player = self.game, self.player
+        analyses = list(player.analyze(game, multipv=3, max_depth=4))
+        self.assertEqual([a.depth for a in analyses], [1, 2, 3, 4])
+
+        last = analyses[-1]
+        scores = sorted((player._min_value(game.forecast_move(move),
+                                           game.active_player, 3,
+                                           float("-inf"), float("inf"))[0]
+                         for move in game.get_legal_moves()), reverse=True)
+        self.assertEqual([line.score for line in last.lines], scores[:3])
+        for line in last.lines:
+            replay = game
+            self.assertEqual(line.pv[0], line.move)
+            for move in line.pv:
+                self.assertIn(move, replay.get_legal_moves())
+                replay = replay.forecast_move(move)
+
+
+class PartialIterationTest(SearchTestCase):
+    """Check the root moves kept from an interrupted search iteration"""
+
+    def test_partial_result_is_exact(self):
+        game, player = self.game, self.player
+        moves = sorted(game.get_legal_moves())
+        exact = {move: player._min_value(game.forecast_move(move),
+                                         game.active_player, 5,
+                                         float("-inf"), float("inf"))[0]
+                 for move in moves}
+        # Search the worst move first, so that later moves improve on it
+        moves.sort(key=exact.get)
+
+        for budget in (100, 200, 240):
+            random.seed(budget)
+            checks = iter(range(budget))
+            player.time_left = (
+                lambda: 0 if next(checks, None) is None else 100)
+            player.stats = game_agent.SearchStats()
+            with self.assertRaises(game_agent.SearchTimeout):
+                player._search_root(game, 6, moves)
+            move, searched = player._partial
+            self.assertGreater(searched, 0)
+            self.assertEqual(exact[move],
+                             max(exact[m] for m in moves[:searched]))
+            self.assertGreaterEqual(exact[move], exact[moves[0]])
+
+        random.seed(0)
+        checks = iter(range(300))
+        move = player.get_move(
+            game, lambda: 0 if next(checks, None) is None else 100)
+        self.assertIn(move, game.get_legal_moves())
+        self.assertGreater(player.stats.partial_moves, 0)
+
+
+class LargeBoardTest(unittest.TestCase):
+    """Check the opening candidates and heuristics on a 15x15 board"""
+
+    def test_opening_and_scores(self):
+        game = isolation.Board("Player1", "Player2", width=15, height=15)
+        player = game_agent.AlphaBetaPlayer()
+        moves = player._legal_moves(game)
+        self.assertEqual(len(moves), game_agent.OPENING_CANDIDATES)
+        self.assertEqual(moves[0], (7, 7))
+        self.assertTrue(all(abs(r - 7) <= 4 and abs(c - 7) <= 4
+                            for r, c in moves))
+
+        rng = random.Random(2)
+        for _ in range(30):
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        self.assertEqual(isolation.Board.from_bytes(game.to_bytes()).hash(),
+                         game.hash())
+        blank_spaces = set(game.get_blank_spaces())
+        discount = 0.5 + game.move_count / 100.
+        expected = 0.
+        for sign, player in ((1, game.active_player),
+                             (-1, game.inactive_player)):
+            moves = game_agent.get_moves(game.get_player_location(player),
+                                         blank_spaces)
+            border = [move for move in moves
+                      if game_agent.is_border_move(move, 15, 15)]
+            expected += sign * (len(moves) - discount * len(border))
+        self.assertAlmostEqual(game_agent.custom_score_3(
+            game, game.active_player, average_moves=100.), expected)
+
+
+class GeometryTest(unittest.TestCase):
+    """Check the per-geometry tables against the board rules"""
+
+    def test_tables(self):
+        self.assertEqual(geometry(7, 7).average_moves, 35.5)
+        for width, height in [(7, 7), (8, 5), (12, 12)]:
+            geo = geometry(width, height)
+            self.assertGreater(geo.average_moves, 0)
+            game = isolation.Board("Player1", "Player2", width, height)
+            for r, c in game.get_blank_spaces():
+                idx = r + c * height
+                game.apply_move((r, c))
+                self.assertEqual(len(geo.targets[idx]), game.mobility(
+                    game.inactive_player))
+                game.undo_move()
+                self.assertEqual(geo.border >> idx & 1,
+                                 r in (0, height - 1) or c in (0, width - 1))
+
+    def test_average_moves(self):
+        self.assertEqual(geometry(12, 12).average_moves, 103.9)
+        # Unlisted sizes are estimated without playing calibration games
+        start = timeit.default_timer()
+        self.assertAlmostEqual(geometry(9, 4).average_moves, 35.5 * 36 / 49)
+        self.assertLess(timeit.default_timer() - start, .05)
+
+        self.addCleanup(CALIBRATED_MOVES.pop, (9, 4))
+        self.assertEqual(calibrate(9, 4, games=8).average_moves,
+                         calibrate_average_moves(9, 4, games=8))
+        self.assertEqual(geometry(9, 4).average_moves,
+                         CALIBRATED_MOVES[(9, 4)])
+
+
+class FloodFillTest(unittest.TestCase):
+    """Check the bit-parallel BFS layers, regions and Voronoi split"""
+
+    def test_layers_match_board_moves(self):
+        rng = random.Random(5)
+        game = isolation.Board("Player1", "Player2", width=8, height=5)
+        shifts = bitboard.shift_tables(game.width, game.height)
+        full = (1 << (game.width * game.height)) - 1
+        while game.get_legal_moves():
+            game.apply_move(rng.choice(game.get_legal_moves()))
+            blocked, _, location = bitboard.board_bits(game)
+            frontier = {bitboard.to_move(location, game.height)}
+            reached = set()
+            for layer in bitboard.bfs_layers(location, blocked, shifts, full):
+                frontier = {(r + dr, c + dc) for r, c in frontier
+                            for dr, dc in bitboard._DIRECTIONS
+                            if game.move_is_legal((r + dr, c + dc))} - reached
+                reached |= frontier
+                self.assertEqual({bitboard.to_move(idx, game.height)
+                                  for idx in bitboard.iter_bits(layer)},
+                                 frontier)
+            self.assertFalse({(r + dr, c + dc) for r, c in frontier
+                              for dr, dc in bitboard._DIRECTIONS
+                              if game.move_is_legal((r + dr, c + dc))} -
+                             reached)
+
+    def test_regions_on_small_board(self):
+        # On a 3x3 board the centre is out of knight's reach and the other
+        # cells form the cycle (0, 0) (1, 2) (2, 0) (0, 1) (2, 2) (1, 0)
+        # (0, 2) (2, 1)
+        def mask(*cells):
+            return sum(1 << (r + c * 3) for r, c in cells)
+
+        def board(blocked, p1_loc, p2_loc):
+            return isolation.Board._from_state(
+                "Player1", "Player2", 3, 3, mask(*blocked),
+                p1_loc[0] + p1_loc[1] * 3, p2_loc[0] + p2_loc[1] * 3, 0)
+
+        shifts = bitboard.shift_tables(3, 3)
+        full = mask(*[(r, c) for r in range(3) for c in range(3)])
+
+        def terms(game, player):
+            node = features.NodeFeatures(game, player)
+            return [features.region_term(node), features.voronoi_term(node)]
+
+        # Player 1 is walled off in the centre
+        game = board([(1, 1), (0, 0)], (1, 1), (0, 0))
+        blocked, own, opp = bitboard.board_bits(game)
+        self.assertEqual(bitboard.flood_fill(own, blocked, shifts, full), 0)
+        self.assertEqual(bitboard.flood_fill(opp, blocked, shifts, full),
+                         full & ~mask((1, 1), (0, 0)))
+        self.assertEqual(bitboard.voronoi(blocked, own, opp, shifts, full),
+                         (0, full & ~mask((1, 1), (0, 0))))
+        self.assertEqual(terms(game, "Player1"), [-7, -7])
+
+        # (2, 2) cuts the cycle: (1, 2) is one move from both players,
+        # (0, 1) is only reached by player 2 and the rest by player 1
+        game = board([(0, 0), (2, 0), (2, 2)], (0, 0), (2, 0))
+        blocked, own, opp = bitboard.board_bits(game)
+        self.assertEqual(bitboard.flood_fill(own, blocked, shifts, full),
+                         mask((1, 2), (2, 1), (0, 2), (1, 0)))
+        self.assertEqual(bitboard.flood_fill(opp, blocked, shifts, full),
+                         mask((1, 2), (0, 1)))
+        self.assertEqual(bitboard.voronoi(blocked, own, opp, shifts, full),
+                         (mask((2, 1), (0, 2), (1, 0)), mask((0, 1))))
+        self.assertEqual(terms(game, "Player1"), [2, 2])
+        self.assertEqual(terms(game, "Player2"), [-2, -2])
+
+
+class TimeSweepTest(unittest.TestCase):
+    """Check the game schedule and strength curve of time_sweep.py"""
+
+    def test_tasks_and_curve(self):
+        tasks = time_sweep.make_tasks("AB_Custom", "AB_Improved", [50, 100],
+                                      3, reference_time=150)
+        self.assertEqual(len(tasks), 3 * 2 * 2)
+        for limit in (50, 100):
+            games = [t for t in tasks if t[2] == limit]
+            self.assertEqual([t[5] for t in games], [True, False] * 3)
+            self.assertTrue(all(t[3] == 150 for t in games))
+
+        results = ([(50, False, "")] * 10 +
+                   [(100, True, "")] * 5 + [(100, False, "")] * 5 +
+                   [(200, True, "")] * 7 + [(200, False, "")] * 3)
+        curve = time_sweep.strength_curve(results, [50, 100, 200])
+        self.assertEqual([point[:4] for point in curve],
+                         [(50, 10, 0, 0.), (100, 10, 5, .5),
+                          (200, 10, 7, .7)])
+        self.assertAlmostEqual(curve[1][5], 0.)
+        self.assertEqual(time_sweep.saturation_point(curve), 100)
+
+
+class ScriptedPlayer(object):
+    """A player that replays a fixed list of moves"""
+
+    def __init__(self, moves):
+        self.moves = iter(moves)
+
+    def get_move(self, game, time_left):
+        return next(self.moves, (-1, -1))
+
+
+class BatchSimulateTest(unittest.TestCase):
+    """Check the games played by batch.simulate() against Board.play()"""
+
+    def test_outcomes_match_board(self):
+        height = 5
+        result = batch.simulate(20, ("improved", "random"), width=6,
+                                height=height, opening=[(2, 2)], seed=4)
+        for winner, history, length in zip(*result):
+            moves = [(int(idx) % height, int(idx) // height)
+                     for idx in history[:length]]
+            self.assertEqual(moves[0], (2, 2))
+            players = (ScriptedPlayer(moves[0::2]),
+                       ScriptedPlayer(moves[1::2]))
+            game = isolation.Board(players[0], players[1], width=6,
+                                   height=height)
+            board_winner, board_history, outcome = game.play(
+                time_limit=float("inf"))
+            self.assertEqual([tuple(move) for move in board_history], moves)
+            self.assertEqual(outcome, "illegal move")
+            self.assertIs(board_winner, players[winner])
+
+
+class MCTSTest(unittest.TestCase):
+    """Check the Monte Carlo tree search of competition_agent.CustomPlayer"""
+
+    def test_finds_win_and_reuses_tree(self):
+        game = isolation.Board("Player1", "Player2")
+        for move in [(6, 0), (5, 5), (5, 2), (3, 6), (3, 1), (4, 4), (4, 3),
+                     (6, 3), (3, 5), (5, 1), (1, 6), (3, 0), (2, 4), (1, 1),
+                     (0, 5), (0, 3), (2, 6), (2, 2), (1, 4), (4, 1), (3, 3),
+                     (6, 2), (5, 4), (5, 0)]:
+            game.apply_move(move)
+        # (4, 2) is the only move that leaves the opponent without a reply
+        for policy in competition_agent.CustomPlayer.PLAYOUT_POLICIES:
+            player = competition_agent.CustomPlayer(playout_policy=policy)
+            self.assertEqual(player.get_move(game, timer(50)), (4, 2))
+            self.assertGreater(player.playouts, 0)
+
+        game = isolation.Board("Player1", "Player2")
+        player = competition_agent.CustomPlayer()
+        game.apply_move(player.get_move(game, timer(50)))
+        # Reply with a move expanded in the kept tree
+        reply = max(player._root.children, key=lambda child: child.visits)
+        game.apply_move(bitboard.to_move(reply.move, game.height))
+        self.assertIsNotNone(player._find_root(bitboard.board_bits(game)))
+        self.assertIn(player.get_move(game, timer(50)),
+                      game.get_legal_moves())
+
+
+class EngineProtocolTest(unittest.TestCase):
+    """Check the engine protocol in process and over a child process"""
+
+    def test_round_trip(self):
+        moves = [(3, 3), (2, 4), (1, 2)]
+        line = engine.format_position(7, 5, moves)
+        self.assertEqual(engine.parse_position(line.split()[1:]),
+                         (7, 5, moves))
+
+        host = engine.EngineHost(sample_players.GreedyPlayer(), "Greedy")
+        stdout = io.StringIO()
+        host.serve(io.StringIO("isolation\n{}\ngo 7 100\nquit\n"
+                               "go 8 100\n".format(line)), stdout)
+        ready, bestmove = stdout.getvalue().splitlines()
+        self.assertEqual(ready, "ready Greedy")
+        request_id, move = engine.parse_bestmove(bestmove)
+        game = isolation.Board("Player1", "Player2", 7, 5)
+        for m in moves:
+            game.apply_move(m)
+        self.assertEqual(request_id, 7)
+        self.assertIn(move, game.get_legal_moves())
+
+        with engine.EngineProcess(engine.engine_command("Greedy")) as e1, \
+                engine.EngineProcess(engine.engine_command("Random")) as e2:
+            winner, history, outcome = engine.play_engines(
+                e1, e2, opening=[(3, 3)], time_limit=1000)
+            replay = isolation.Board(e1, e2)
+            replay.apply_move((3, 3))
+            for move in history:
+                self.assertIn(tuple(move), replay.get_legal_moves())
+                replay.apply_move(tuple(move))
+            self.assertEqual(outcome, "illegal move")
+            self.assertIs(winner, replay.inactive_player)
+
+
+class SchedulerTest(unittest.TestCase):
+    """Check the asyncio scheduler games and engine pool"""
+
+    def test_games_and_failed_acquire(self):
+        specs = [tournament.GameSpec(0, "Random", "Greedy", test_first,
+                                     [(3, 3), (2, 4)], 1000)
+                 for test_first in (True, False)]
+
+        async def play():
+            return [result async for result in scheduler.run_games(specs, 2)]
+
+        results = asyncio.run(play())
+        self.assertEqual(sorted(r.spec.test_first for r in results),
+                         [False, True])
+        for result in results:
+            self.assertEqual(result.termination, "illegal move")
+            # The loser is the player to move after the last move
+            loser = (len(result.spec.opening) + len(result.history)) % 2
+            test_index = 0 if result.spec.test_first else 1
+            self.assertEqual(result.test_won, loser != test_index)
+
+        class FailingPool(object):
+            def __init__(self):
+                self.released = []
+
+            async def acquire(self, name):
+                if name == "Greedy":
+                    raise engine.EngineError(name)
+                return name
+
+            async def release(self, engine):
+                self.released.append(engine)
+
+        pool = FailingPool()
+        with self.assertRaises(engine.EngineError):
+            asyncio.run(scheduler.play_game(pool, specs[1]))
+        self.assertEqual(pool.released, ["Random"])
+
+
+class WorkQueueTest(unittest.TestCase):
+    """Check that jobs held by a worker that dies are handed out again"""
+
+    def run_queue(self, specs, max_attempts):
+        coordinator = work_queue.Coordinator(specs, ("127.0.0.1", 0),
+                                             max_attempts=max_attempts)
+        results = {}
+        consumer = threading.Thread(
+            target=lambda: results.update(coordinator.results()))
+        consumer.start()
+        # A worker that takes a job and dies without answering
+        with socket.create_connection(coordinator.address) as sock:
+            sock.sendall(b'{"type": "request"}\n')
+            dropped = json.loads(sock.makefile("rb").readline().decode())
+        work_queue.work(coordinator.address, lambda spec: spec * 2)
+        consumer.join()
+        return dropped["id"], results
+
+    def test_retry_and_failure(self):
+        dropped, results = self.run_queue([1, 2, 3], max_attempts=2)
+        self.assertEqual(results, {0: 2, 1: 4, 2: 6})
+
+        dropped, results = self.run_queue([1, 2], max_attempts=1)
+        self.assertIsInstance(results.pop(dropped), work_queue.JobFailed)
+        self.assertEqual(list(results.values()), [4 - 2 * dropped])
+
+    def test_no_coordinator(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            address = sock.getsockname()
+        with self.assertRaises(ConnectionError):
+            work_queue.work(address, lambda spec: spec, retry_interval=.01,
+                            connect_timeout=.1)
+
+
+class ResultStoreTest(unittest.TestCase):
+    """Check the keys of stored games and resuming from the store"""
+
+    def test_keys_and_resume(self):
+        specs = [tournament.GameSpec(match, "AB_Improved", "AB_Custom",
+                                     test_first, [(3, 3), (2, 4)], 150)
+                 for match in range(2) for test_first in (True, False)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.db")
+            with results_store.ResultStore(path) as store:
+                self.assertEqual(len({store.key(s) for s in specs}), 4)
+                store.put(tournament.GameResult(specs[1], True, "timeout",
+                                                [(1, 2)]))
+            with results_store.ResultStore(path) as store:
+                results, remaining = tournament.stored_results(specs, store)
+                self.assertEqual(results, [tournament.GameResult(
+                    specs[1], True, "timeout", [[1, 2]])])
+                self.assertEqual(remaining, specs[:1] + specs[2:])
+                self.assertIsNone(store.get(specs[1]._replace(
+                    time_limit=300)))
+
+        # Editing a helper of a heuristic changes the agents that use it
+        before = {name: agents.agent_fingerprint(name)
+                  for name in ("AB_Custom", "AB_Improved")}
+        source = agents._source(game_agent.deep_moves_bits)
+        agents._SOURCES[game_agent.deep_moves_bits] = source + "# edited"
+        try:
+            self.assertNotEqual(agents.agent_fingerprint("AB_Custom"),
+                                before["AB_Custom"])
+            self.assertEqual(agents.agent_fingerprint("AB_Improved"),
+                             before["AB_Improved"])
+        finally:
+            agents._SOURCES[game_agent.deep_moves_bits] = source
+
+
+class SelfPlayShardTest(unittest.TestCase):
+    """Check that self-play shards read back into the learned evaluator"""
+
+    def test_shards_round_trip(self):
+        width, height = 5, 5
+        rng = random.Random(6)
+        perms = selfplay.symmetries(width, height)
+        records = []
+        for _ in range(3):
+            records.extend(packed for _, packed in selfplay.play_selfplay_game(
+                sample_players.improved_score, 1, 0.2, width, height, perms,
+                rng))
+        with tempfile.TemporaryDirectory() as directory:
+            with selfplay.ShardWriter(directory, width, height) as writer:
+                for packed in records:
+                    writer.write(packed)
+            paths = [os.path.join(directory, name)
+                     for name in sorted(os.listdir(directory))]
+            read = [record for path in paths
+                    for record in selfplay.read_shard(path)]
+            weights = evaluator.fit_linear(paths)
+        self.assertEqual(read, [selfplay.unpack_record(packed, width, height)
+                                for packed in records])
+        self.assertEqual(weights["w"].shape, (len(evaluator.FEATURES),))
+
+        # The stored cells index the board as Board does
+        score_fn = evaluator.Evaluator(weights)
+        for record in read:
+            self.assertIn(record.outcome, (-1, 1))
+            side = record.ply % 2
+            locations = [record.active, record.inactive][::1 - 2 * side]
+            game = isolation.Board._from_state(
+                "Player1", "Player2", width, height, record.blocked,
+                *[None if loc < 0 else loc for loc in locations], side)
+            self.assertEqual(game.move_count, record.ply)
+            features = evaluator.extract_features(
+                evaluator.unpack_masks([record.blocked], width * height),
+                np.array([record.active]), np.array([record.inactive]),
+                width, height)
+            self.assertAlmostEqual(score_fn(game, game.active_player),
+                                   score_fn.predict(features)[0])
+
+
+class TuneTest(SearchTestCase):
+    """Check the SPSA tuner's parameters and checkpoints"""
+
+    def test_defaults_and_checkpoint(self):
+        game = self.game
+        for name, (function, params) in tune.TUNABLE.items():
+            values = {k: p.default for k, p in params.items()}
+            self.assertEqual(tune.score_function(name, values)(
+                game, "Player1"), function(game, "Player1"))
+            theta = tune.normalize(params, values)
+            self.assertEqual(list(tune.denormalize(params, theta).values()),
+                             list(values.values()))
+
+        class LocalPool(object):
+            def imap_unordered(self, function, tasks):
+                return map(function, tasks)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "checkpoint.json")
+            for iterations in (1, 2):
+                state = tune.spsa(LocalPool(), "custom_score_3", 1, 2, 20.,
+                                  path)
+                self.assertEqual(state["iteration"], iterations)
+            self.assertEqual(tune.load_checkpoint(path, "custom_score_3"),
+                             json.loads(json.dumps(state)))
+
+
+class EvaluatorTest(unittest.TestCase):
+    """Check the batched learned evaluator against per-position scoring"""
+
+    def test_batch_matches_single(self):
+        game = isolation.Board("Player1", "Player2")
+        for move in [(6, 6), (6, 5), (5, 4), (5, 3), (6, 2), (6, 1), (5, 0),
+                     (4, 2), (3, 1), (6, 3), (5, 2), (5, 5)]:
+            game.apply_move(move)
+        self.assertEqual(sorted(game.get_legal_moves()),
+                         [(3, 3), (4, 0), (4, 4), (6, 0), (6, 4)])
+        self.assertEqual(game.mobility(game.inactive_player), 3)
+        score_fn = evaluator.Evaluator()
+        children = [game.forecast_move(m) for m in game.get_legal_moves()]
+        for player in ("Player1", "Player2"):
+            np.testing.assert_allclose(
+                score_fn.evaluate_batch(children, player),
+                [score_fn(child, player) for child in children], atol=1e-9)
+            own, opp = player, game.get_opponent(player)
+            features = evaluator.extract_features(
+                evaluator.unpack_masks([game._state.blocked], 49),
+                np.array([game._state.locations[own == "Player2"]]),
+                np.array([game._state.locations[opp == "Player2"]]), 7, 7)
+            self.assertEqual(list(features[0, :2]),
+                             [game.mobility(own), game.mobility(opp)])
+
+        self.assertEqual(score_fn.evaluate_batch([], "Player1").shape, (0,))
+
+        # Frontier nodes are scored in batches with the same result
+        single = game_agent.AlphaBetaPlayer(
+            score_fn=lambda game, player: score_fn(game, player))
+        batched = game_agent.AlphaBetaPlayer(score_fn=score_fn)
+        for player in (single, batched):
+            player.time_left = lambda: float("inf")
+            random.seed(1)
+            player.result = player._max_value(
+                game, game.active_player, 3, float("-inf"), float("inf"))
+        self.assertAlmostEqual(single.result[0], batched.result[0])
+
+
+def old_custom_score(game, player):
+    """custom_score as it was before the feature terms, with the moves of a
+    game of 35 moves"""
+    blank_spaces = set(game.get_blank_spaces())
+    opponent = game.get_opponent(player)
+    aggressiveness = 1.5 + game.move_count / 35
+    max_level = 4 if len(blank_spaces) < game.width * game.height / 2 else 2
+    own = game_agent.deep_moves_available(game.get_player_location(player),
+                                          blank_spaces, max_level)
+    opp = game_agent.deep_moves_available(game.get_player_location(opponent),
+                                          blank_spaces, max_level)
+    return (float(own - aggressiveness * opp) /
+            (len(blank_spaces) * max_level))
+
+
+def old_custom_score_3(game, player):
+    """custom_score_3 as it was before the feature terms"""
+    discount = 0.5 + game.move_count / 35.5
+    own = game.get_legal_moves(player)
+    opp = game.get_legal_moves(game.get_opponent(player))
+    border = game_agent.num_border_moves
+    return float(len(own) - discount * border(own, game)
+                 - len(opp) + discount * border(opp, game))
+
+
+class BlendTest(unittest.TestCase):
+    """Check blended terms against the custom scores they were split from"""
+
+    def test_terms_match_custom_scores(self):
+        blends = [
+            (old_custom_score, features.Blend((1., functools.partial(
+                game_agent.deep_mobility_term, aggressiveness_moves=35.)))),
+            (old_custom_score_3, features.Blend(
+                (1., game_agent.border_mobility_term))),
+            (game_agent.custom_score_3, features.Blend(
+                (1., game_agent.border_mobility_term))),
+            (sample_players.improved_score, features.Blend(
+                (1., features.improved_term))),
+            (sample_players.center_score, features.Blend(
+                (1., features.center_term))),
+        ]
+        rng = random.Random(9)
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((2, 4))
+        while True:
+            for player in ("Player1", "Player2"):
+                for score_fn, blend in blends:
+                    if game.is_winner(player) or game.is_loser(player):
+                        self.assertEqual(blend(game, player),
+                                         game.utility(player))
+                    else:
+                        self.assertAlmostEqual(blend(game, player),
+                                               score_fn(game, player))
+                # custom_score_2 draws one random number per call
+                random.seed(game.move_count)
+                expected = game_agent.custom_score_2(game, player)
+                random.seed(game.move_count)
+                self.assertEqual(features.Blend(
+                    (1., game_agent.noisy_mobility_term))(game, player),
+                    expected)
+            if not game.get_legal_moves():
+                break
+            game.apply_move(rng.choice(game.get_legal_moves()))
+
+
+class EvalCacheTest(unittest.TestCase):
+    """Check the hits and least recently used evictions of EvalCache"""
+
+    def test_hits_and_evictions(self):
+        calls = []
+
+        def score_fn(game, player):
+            calls.append((game.hash(), player))
+            return game_agent.custom_score_3(game, player)
+
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((3, 3))
+        a, b, c, d = [game.forecast_move(m) for m in [(1, 2), (5, 6),
+                                                       (0, 0), (6, 6)]]
+        cache = eval_cache.EvalCache(score_fn, size=3)
+        for position in (a, b, c, a):
+            self.assertEqual(cache(position, "Player1"),
+                             game_agent.custom_score_3(position, "Player1"))
+        self.assertEqual((cache.hits, cache.misses, len(calls)), (1, 3, 3))
+        cache(a, "Player2")  # the other player is a separate entry
+        self.assertEqual((cache.evictions, len(cache)), (1, 3))
+        # b was the least recently used entry
+        for position in (a, c, b):
+            cache(position, "Player1")
+        self.assertEqual((cache.hits, cache.misses, cache.evictions),
+                         (3, 5, 2))
+        self.assertEqual(calls[-1], (b.hash(), "Player1"))
+
+        # Batches only pass the uncached positions on
+        batched = eval_cache.EvalCache(evaluator.Evaluator(), size=3)
+        batched.evaluate_batch([a, b], "Player1")
+        scores = batched.evaluate_batch([a, c, d], "Player1")
+        self.assertEqual((batched.hits, batched.misses, batched.evictions),
+                         (1, 4, 1))
+        np.testing.assert_allclose(scores, [batched.score_fn(p, "Player1")
+                                            for p in (a, c, d)])
+
+        # Every registered agent gets its own cache
+        first, second = [agents.make_agent("AB_Custom_Cached")
+                         for _ in range(2)]
+        self.assertIsInstance(first.score, eval_cache.EvalCache)
+        self.assertIsNot(first.score, second.score)
+        first.score(a, "Player1")
+        self.assertEqual((len(first.score), len(second.score)), (1, 0))
+        self.assertEqual(agents.agent_fingerprint("AB_Custom_Cached"),
+                         agents.agent_fingerprint("AB_Custom_Cached"))
+
+
+class AnalyzeGameTest(unittest.TestCase):
+    """Check that analyze.py reviews a known game and skips corrupt ones"""
+
+    def setUp(self):
+        self.options = {"agent": "AB_Improved", "final": False,
+                        "multipv": 1, "depth": 2, "time_limit": None,
+                        "margin": analyze.BLUNDER_MARGIN}
+
+    def test_known_game(self):
+        moves = [(3, 3), (2, 2), (1, 4), (4, 3), (3, 5)]
+        player = agents.make_agent("AB_Improved")
+        game = isolation.Board("Player1", "Player2")
+        entries = analyze.analyze_game(player, game, moves, 2, None,
+                                       analyze.BLUNDER_MARGIN)
+        self.assertEqual([e["ply"] for e in entries], [2, 3, 4])
+        self.assertEqual([e["move"] for e in entries], moves[2:])
+        self.assertEqual(game.move_count, len(moves))
+        for entry in entries:
+            self.assertEqual(entry["depth"], 2)
+            self.assertGreaterEqual(entry["score"], entry["played_score"])
+
+        output = json.loads(analyze.run_task(
+            (json.dumps({"id": "known", "moves": moves}), 1, self.options)))
+        self.assertEqual(output["id"], "known")
+        self.assertEqual(len(output["moves"]), 3)
+
+    def test_corrupt_games(self):
+        # (3, 3) is not a knight's move away from (1, 4)
+        corrupt = json.dumps([[3, 3], [2, 2], [1, 4], [4, 3], [3, 3]])
+        output = json.loads(analyze.run_task((corrupt, 7, self.options)))
+        self.assertEqual(output, {"id": 7,
+                                  "error": "illegal move [3, 3] at ply 4"})
+        final = dict(self.options, final=True)
+        output = json.loads(analyze.run_task((corrupt, 7, final)))
+        self.assertEqual(output["error"], "illegal move [3, 3] at ply 4")
+        output = json.loads(analyze.run_task(("{not json", 8, final)))
+        self.assertEqual(output["id"], 8)
+        self.assertIn("line 8 is not a game", output["error"])
+
+
 if __name__ == '__main__':
     unittest.main()
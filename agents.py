@@ -0,0 +1,192 @@
+"""Registry of the named agents used by tournament.py and the other match
+scripts.  Agents are looked up by name so that they can be chosen on the
+command line and rebuilt inside worker processes.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+from collections import OrderedDict
+
+from sample_players import (RandomPlayer, GreedyPlayer, open_move_score,
+                            improved_score, center_score)
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
+                        custom_score_2, custom_score_3)
+from competition_agent import CustomPlayer
+from eval_cache import EvalCache
+from evaluator import Evaluator
+from isolation.features import Blend, improved_term
+
+
+class PerAgent(object):
+    """A constructor argument that `make_agent` builds anew for every agent,
+    for state that agents must not share, such as a cache.
+    """
+
+    def __init__(self, factory, *args, **kwargs):
+        self.factory = functools.partial(factory, *args, **kwargs)
+
+
+AGENTS = OrderedDict([
+    ("Random", (RandomPlayer, {})),
+    ("Greedy", (GreedyPlayer, {})),
+    ("MM_Open", (MinimaxPlayer, {"score_fn": open_move_score})),
+    ("MM_Center", (MinimaxPlayer, {"score_fn": center_score})),
+    ("MM_Improved", (MinimaxPlayer, {"score_fn": improved_score})),
+    ("AB_Open", (AlphaBetaPlayer, {"score_fn": open_move_score})),
+    ("AB_Center", (AlphaBetaPlayer, {"score_fn": center_score})),
+    ("AB_Improved", (AlphaBetaPlayer, {"score_fn": improved_score})),
+    ("AB_Custom", (AlphaBetaPlayer, {"score_fn": custom_score})),
+    ("AB_Custom_2", (AlphaBetaPlayer, {"score_fn": custom_score_2})),
+    ("AB_Custom_3", (AlphaBetaPlayer, {"score_fn": custom_score_3})),
+    ("AB_Custom_Cached", (AlphaBetaPlayer,
+                          {"score_fn": PerAgent(EvalCache, custom_score)})),
+    ("AB_Improved_Selective", (AlphaBetaPlayer, {
+        "score_fn": Blend((1., improved_term)), "extend_forced": True,
+        "late_move_reductions": True, "futility_margin": 2.})),
+    ("AB_Learned", (AlphaBetaPlayer, {"score_fn": Evaluator()})),
+    ("MCTS", (CustomPlayer, {})),
+    ("MCTS_Mobility", (CustomPlayer, {"playout_policy": "mobility"})),
+])
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_SOURCES = {}
+
+
+def agent_arguments(name):
+    """Return the player class and a new set of constructor arguments of the
+    agent registered as `name`.
+    """
+    try:
+        player_cls, kwargs = AGENTS[name]
+    except KeyError:
+        raise ValueError("Unknown agent: {}".format(name))
+    return player_cls, {key: value.factory() if isinstance(value, PerAgent)
+                        else value for key, value in kwargs.items()}
+
+
+def make_agent(name):
+    """Construct a new player instance for the agent registered as `name`.
+    """
+    player_cls, kwargs = agent_arguments(name)
+    return player_cls(**kwargs)
+
+
+def _is_local(value):
+    """Whether a function or class is defined in this repository. """
+    module = sys.modules.get(getattr(value, "__module__", None))
+    path = getattr(module, "__file__", None)
+    return bool(path) and os.path.abspath(path).startswith(_ROOT)
+
+
+def _code_names(code):
+    """Return the global names used by a code object and the code nested in
+    it (comprehensions, inner functions and lambdas).
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def _dependencies(value, found):
+    """Add `value` and, recursively, the module-level functions and classes
+    of this repository its code refers to, to `found`, keyed by their
+    qualified names.
+    """
+    key = "{}.{}".format(value.__module__, value.__qualname__)
+    if key in found or not _is_local(value):
+        return
+    found[key] = value
+    if inspect.isclass(value):
+        functions = []
+        for member in vars(value).values():
+            if isinstance(member, property):
+                functions.extend(f for f in (member.fget, member.fset) if f)
+            else:
+                functions.append(getattr(member, "__func__", member))
+    else:
+        functions = [value]
+    for function in functions:
+        if not inspect.isfunction(function):
+            continue
+        for name in _code_names(function.__code__):
+            dependency = function.__globals__.get(name)
+            if inspect.isfunction(dependency) or inspect.isclass(dependency):
+                _dependencies(dependency, found)
+
+
+def _callables(value):
+    """Generate the functions and classes held by a callable object: its
+    class and the callables in its public attributes.
+    """
+    if isinstance(value, functools.partial):
+        yield from _callables(value.func)
+    elif inspect.isfunction(value) or inspect.isclass(value):
+        yield value
+    elif inspect.ismethod(value):
+        yield value.__func__
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _callables(item)
+    elif callable(value):
+        yield type(value)
+        for name, attribute in sorted(vars(value).items()):
+            if not name.startswith("_"):
+                yield from _callables(attribute)
+
+
+def _source(value):
+    if value not in _SOURCES:
+        try:
+            _SOURCES[value] = inspect.getsource(value)
+        except (OSError, TypeError):
+            _SOURCES[value] = ""
+    return _SOURCES[value]
+
+
+def _describe(value):
+    """Return a JSON-serializable description of an agent parameter. Code is
+    described by its name and a digest of its source and of the source of
+    the functions and classes it calls, so that editing a heuristic or any
+    of its helpers changes the description of every agent that uses it.
+    """
+    if isinstance(value, PerAgent):
+        return {"per_agent": _describe(value.factory)}
+    if isinstance(value, functools.partial):
+        return {"partial": _describe(value.func),
+                "args": [_describe(arg) for arg in value.args],
+                "kwargs": {k: _describe(v)
+                           for k, v in sorted(value.keywords.items())}}
+    if callable(value):
+        found = {}
+        for function in _callables(value):
+            _dependencies(function, found)
+        digest = hashlib.sha1()
+        for key in sorted(found):
+            digest.update("{}\n{}".format(key, _source(found[key])).encode())
+        return "{}.{}:{}".format(
+            getattr(value, "__module__", ""),
+            getattr(value, "__qualname__", repr(value)),
+            digest.hexdigest()[:12])
+    return repr(value)
+
+
+def agent_fingerprint(name):
+    """Return a hash of the configuration of a registered agent: its class
+    (and base classes) and constructor arguments, including the source code
+    of both and of the helper functions and classes they call.
+    """
+    try:
+        player_cls, kwargs = AGENTS[name]
+    except KeyError:
+        raise ValueError("Unknown agent: {}".format(name))
+    config = [[_describe(cls) for cls in player_cls.__mro__
+               if cls is not object],
+              {key: _describe(value) for key, value in kwargs.items()}]
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()
+                        ).hexdigest()[:16]
@@ -0,0 +1,218 @@
+"""Analyze positions or whole games offline with a search agent over a pool
+of worker processes.
+
+Every line of the input is a JSON move history from the empty board, in the
+`[[r, c], ...]` format returned by `Board.play()`, or an object holding one:
+
+    [[3, 3], [2, 4], [1, 2], ...]
+    {"id": "game-17", "moves": [[3, 3], ...], "width": 7, "height": 7}
+
+By default every move after the two opening placements is analyzed: the
+output line of a game lists, for each such move, the best move and score at
+the deepest completed depth, the score of the move played and whether it was
+a blunder, i.e. scored worse than the best move by more than the blunder
+margin.  With --final only the position after the last move is analyzed,
+and its best lines are written instead:
+
+    python analyze.py games.jsonl -o review.jsonl --agent AB_Improved
+    python analyze.py positions.jsonl --final --multipv 3 --depth 8
+
+Results are written in input order as soon as they are ready.  A line that
+is not a valid game, e.g. one with an illegal move, is reported on standard
+error and gets an output line holding its id and an "error" instead.
+"""
+import argparse
+import json
+import sys
+import timeit
+
+from multiprocessing import Pool, cpu_count
+
+from agents import make_agent
+from game_agent import AlphaBetaPlayer
+from isolation import Board
+
+TIME_LIMIT = 1000  # milliseconds per analyzed position
+BLUNDER_MARGIN = 2.  # score loss that flags a move, in score function units
+WIN_SCORE = 1e9  # stands for the infinite scores of decided games in JSON
+
+
+class InvalidGame(Exception):
+    """Raised for an input line that is not a valid game. """
+    pass
+
+
+def parse_line(line, number):
+    """Return the id, board size and move history of an input line. """
+    try:
+        record = json.loads(line)
+        if isinstance(record, list):
+            record = {"moves": record}
+        return (record.get("id", number), record.get("width", 7),
+                record.get("height", 7),
+                [tuple(move) for move in record["moves"]])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise InvalidGame("line {} is not a game: {}".format(number, e))
+
+
+def legal_moves(game, move, ply):
+    """Return the legal moves of `game`, which must include the move played
+    at `ply` of an input game.
+    """
+    legal = game.get_legal_moves()
+    if move not in legal:
+        raise InvalidGame("illegal move {} at ply {}".format(list(move),
+                                                             ply))
+    return legal
+
+
+def timer(time_limit):
+    """Return a `time_left` callable in the same format as `Board.play()`,
+    or None for no time limit.
+    """
+    if time_limit is None:
+        return None
+    time_millis = lambda: 1000 * timeit.default_timer()
+    move_start = time_millis()
+    return lambda: time_limit - (time_millis() - move_start)
+
+
+def finite(score):
+    return max(min(score, WIN_SCORE), -WIN_SCORE)
+
+
+def search(player, game, multipv, max_depth, time_limit):
+    """Return the deepest completed `Analysis` of `game`, or None if not even
+    the first iteration completed.
+    """
+    result = None
+    for result in player.analyze(game, multipv, max_depth,
+                                 timer(time_limit)):
+        pass
+    return result
+
+
+def analyze_game(player, game, moves, max_depth, time_limit, margin):
+    """Analyze every move of a game after the opening placements.
+
+    Returns
+    -------
+    list<dict>
+        One entry per analyzed move.
+    """
+    entries = []
+    for ply, move in enumerate(moves):
+        legal = legal_moves(game, move, ply)
+        if ply >= 2:
+            # Rank every legal move so that the move played gets a score
+            result = search(player, game, len(legal), max_depth, time_limit)
+            if result is not None:
+                best = result.lines[0]
+                played = next(line.score for line in result.lines
+                              if line.move == move)
+                entries.append({"ply": ply, "move": move,
+                                "best": best.move,
+                                "score": finite(best.score),
+                                "played_score": finite(played),
+                                "depth": result.depth,
+                                "blunder": best.score - played > margin})
+        game.apply_move(move)
+    return entries
+
+
+def analyze_final(player, game, multipv, max_depth, time_limit):
+    result = search(player, game, multipv, max_depth, time_limit)
+    if result is None:
+        return {"depth": 0, "lines": []}
+    return {"depth": result.depth,
+            "lines": [{"move": line.move, "score": finite(line.score),
+                       "pv": line.pv} for line in result.lines]}
+
+
+def run_task(task):
+    """Analyze one input line in a worker process and return its output
+    line.
+    """
+    line, number, options = task
+    player = make_agent(options["agent"])
+    record_id = number
+    try:
+        record_id, width, height, moves = parse_line(line, number)
+        game = Board("Player1", "Player2", width, height)
+        output = {"id": record_id}
+        if options["final"]:
+            for ply, move in enumerate(moves):
+                legal_moves(game, move, ply)
+                game.apply_move(move)
+            output.update(analyze_final(player, game, options["multipv"],
+                                        options["depth"],
+                                        options["time_limit"]))
+        else:
+            output["moves"] = analyze_game(player, game, moves,
+                                           options["depth"],
+                                           options["time_limit"],
+                                           options["margin"])
+    except InvalidGame as e:
+        # Report and skip the game instead of failing the whole pool run
+        return json.dumps({"id": record_id, "error": str(e)})
+    return json.dumps(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="JSONL file of move histories")
+    parser.add_argument("-o", "--out", help="output JSONL file "
+                        "(default: standard output)")
+    parser.add_argument("--agent", default="AB_Improved",
+                        help="registered alpha-beta agent to search with")
+    parser.add_argument("--final", action="store_true",
+                        help="only analyze the position after the last move")
+    parser.add_argument("--multipv", type=int, default=1,
+                        help="number of best lines reported with --final")
+    parser.add_argument("--depth", type=int,
+                        help="deepest iteration searched per position")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT,
+                        help="milliseconds per position, 0 for no limit")
+    parser.add_argument("--margin", type=float, default=BLUNDER_MARGIN,
+                        help="score loss that flags a blunder")
+    parser.add_argument("-j", "--jobs", type=int, default=cpu_count(),
+                        help="number of worker processes")
+    args = parser.parse_args()
+    if not args.depth and not args.time_limit:
+        parser.error("either --depth or --time-limit is required")
+    try:
+        player = make_agent(args.agent)
+    except ValueError as e:
+        parser.error(str(e))
+    if not isinstance(player, AlphaBetaPlayer):
+        parser.error("{} is not an alpha-beta agent".format(args.agent))
+
+    options = {"agent": args.agent, "final": args.final,
+               "multipv": args.multipv, "depth": args.depth,
+               "time_limit": args.time_limit or None, "margin": args.margin}
+    with open(args.input) as f:
+        tasks = [(line, number, options)
+                 for number, line in enumerate(f, 1) if line.strip()]
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        with Pool(args.jobs) as pool:
+            for count, line in enumerate(pool.imap(run_task, tasks), 1):
+                out.write(line + "\n")
+                out.flush()
+                error = json.loads(line).get("error")
+                if error:
+                    print("\rskipped line {}: {}".format(
+                        tasks[count - 1][1], error), file=sys.stderr,
+                        flush=True)
+                if args.out:
+                    print("\r{}/{} analyzed".format(count, len(tasks)),
+                          end="", file=sys.stderr, flush=True)
+    finally:
+        if args.out:
+            out.close()
+            print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
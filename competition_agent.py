@@ -2,10 +2,19 @@
 you choose.  This agent will compete against other students (and past
 champions) in a tournament.
 
+The CustomPlayer below uses Monte Carlo Tree Search (UCT) over the integer
+bitmask representation in `isolation.bitboard`, so that far more playouts
+fit into a turn than the `isolation.Board` interface would allow.
+
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import gc
+import math
 import random
 
+from isolation.bitboard import (NOT_MOVED, board_bits, legal_moves,
+                                move_tables, popcount, to_move)
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
@@ -16,7 +25,9 @@ def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
 
-    This should be the best heuristic function for your project submission.
+    The opponent's mobility is weighted twice as much as the player's own,
+    which is the same preference the "mobility" playout policy of
+    CustomPlayer applies to every simulated move.
 
     Parameters
     ----------
@@ -33,16 +44,42 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    if game.is_loser(player):
+        return float("-inf")
+
+    if game.is_winner(player):
+        return float("inf")
+
+    own_moves = game.mobility(player)
+    opp_moves = game.mobility(game.get_opponent(player))
+    return float(own_moves - 2 * opp_moves)
+
+
+class _Node:
+    """A node of the search tree. `wins` counts the playouts won by the
+    player who made `move`, i.e. the player to move at the parent node.
+
+    Nodes do not reference their parent, so discarded subtrees are freed by
+    reference counting without waiting for the cyclic garbage collector.
+    """
+    __slots__ = ("move", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, untried):
+        self.move = move
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0
 
 
 class CustomPlayer:
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
-    You must at least implement the get_move() method and a search function
-    to complete this class, but you may use any of the techniques discussed
-    in lecture or elsewhere on the web -- opening books, MCTS, etc.
+    Moves are chosen by Monte Carlo Tree Search with the UCT selection rule.
+    The tree is kept between turns and re-rooted on the moves that were
+    actually played, so the statistics gathered for the expected replies are
+    not thrown away.
 
     **************************************************************************
           THIS CLASS IS OPTIONAL -- IT IS ONLY USED IN THE ISOLATION PvP
@@ -59,12 +96,42 @@ class CustomPlayer:
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
+
+    exploration : float (optional)
+        The exploration constant of the UCT formula.
+
+    playout_policy : str (optional)
+        "random" plays uniformly random playouts; "mobility" prefers moves
+        that keep the most onward moves and take one from the opponent.
+
+    epsilon : float (optional)
+        Probability of a random move in "mobility" playouts.
+
+    reuse_tree : bool (optional)
+        Keep the search tree between turns.
     """
+    PLAYOUT_POLICIES = ("random", "mobility")
 
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=1., exploration=1.4,
+                 playout_policy="random", epsilon=0.2, reuse_tree=True):
+        if playout_policy not in self.PLAYOUT_POLICIES:
+            raise ValueError("Unknown playout policy: {}".format(
+                playout_policy))
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.exploration = exploration
+        self.playout_policy = playout_policy
+        self.epsilon = epsilon
+        self.reuse_tree = reuse_tree
+        self.playouts = 0
+        self._root = None
+        self._root_state = None
+        self._discarded = None
+
+    def check_time(self):
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +160,146 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        self.playouts = 0
+        self._targets, self._masks = move_tables(game.width, game.height)
+        self._full = (1 << (game.width * game.height)) - 1
+
+        state = board_bits(game)
+        root = self._find_root(state)
+        # Free the rest of the previous tree now rather than after returning
+        self._root = self._discarded = None
+        if root is None:
+            root = _Node(NOT_MOVED, self._legal_moves(*state))
+
+        if not root.untried and not root.children:
+            return (-1, -1)
+
+        if len(root.untried) + len(root.children) > 1:
+            # A full garbage collection over the tree kept from earlier turns
+            # can take longer than the timer threshold, so only the objects
+            # created during this search are left to the collector
+            gc.freeze()
+            try:
+                while True:
+                    self.check_time()
+                    self._iterate(root, *state)
+            except SearchTimeout:
+                pass
+            finally:
+                gc.unfreeze()
+
+        if root.children:
+            best = max(root.children, key=lambda child: child.visits)
+        else:
+            best = _Node(random.choice(root.untried), None)
+
+        blocked, _, inactive = state
+        if self.reuse_tree and best.untried is not None:
+            self._root = best
+            self._root_state = (blocked | 1 << best.move, inactive, best.move)
+        # Keep the unused siblings alive until the next turn, so that freeing
+        # them is not charged to this one
+        self._discarded = root
+        return to_move(best.move, game.height)
+
+    def _find_root(self, state):
+        """Return the node of the kept tree that matches the current state
+        after the opponent's reply, or None if the tree cannot be reused.
+        """
+        if not self.reuse_tree or self._root is None:
+            return None
+        blocked, active, inactive = state
+        root_blocked, root_active, root_inactive = self._root_state
+        if (root_inactive != active or inactive == NOT_MOVED or
+                blocked != root_blocked | 1 << inactive):
+            return None
+        for child in self._root.children:
+            if child.move == inactive:
+                return child
+        return None
+
+    def _legal_moves(self, blocked, active, inactive):
+        return legal_moves(blocked, active, self._targets, self._full)
+
+    def _iterate(self, root, blocked, active, inactive):
+        """Run one selection, expansion, simulation and backpropagation
+        step from the root.
+        """
+        node = root
+        path = [root]
+        log = math.log
+        sqrt = math.sqrt
+        c = self.exploration
+
+        # Selection
+        while not node.untried and node.children:
+            log_visits = log(node.visits)
+            node = max(node.children,
+                       key=lambda child: child.wins / child.visits +
+                       c * sqrt(log_visits / child.visits))
+            path.append(node)
+            blocked |= 1 << node.move
+            active, inactive = inactive, node.move
+
+        # Expansion -- the new child is only attached once its playout has
+        # finished so that a timeout leaves the tree consistent
+        parent = None
+        if node.untried:
+            move = node.untried[random.randrange(len(node.untried))]
+            blocked |= 1 << move
+            active, inactive = inactive, move
+            parent, node = node, _Node(move, None)
+            node.untried = self._legal_moves(blocked, active, inactive)
+
+        # Simulation: the player to move at `node` loses after an even
+        # number of plies
+        plies = self._playout(blocked, active, inactive)
+        reward = 1 if plies % 2 == 0 else 0
+
+        if parent is not None:
+            parent.untried.remove(node.move)
+            parent.children.append(node)
+            path.append(node)
+
+        # Backpropagation
+        for node in reversed(path):
+            node.visits += 1
+            node.wins += reward
+            reward = 1 - reward
+        self.playouts += 1
+
+    def _playout(self, blocked, active, inactive):
+        """Play random (or mobility-guided) moves until the player to move
+        is stuck.
+
+        Returns
+        -------
+        int
+            The number of plies played.
+        """
+        targets = self._targets
+        masks = self._masks
+        full = self._full
+        guided = self.playout_policy == "mobility"
+        epsilon = self.epsilon
+        plies = 0
+        while True:
+            if active == NOT_MOVED:
+                moves = legal_moves(blocked, active, targets, full)
+            else:
+                moves = [t for t in targets[active] if not blocked >> t & 1]
+            if not moves:
+                return plies
+            if guided and random.random() >= epsilon:
+                free = ~blocked
+                opp_mask = 0 if inactive == NOT_MOVED else masks[inactive]
+                move = max(moves, key=lambda m: popcount(masks[m] & free) +
+                           (opp_mask >> m & 1) + random.random() * 0.5)
+            else:
+                move = moves[random.randrange(len(moves))]
+            blocked |= 1 << move
+            active, inactive = inactive, move
+            plies += 1
+            if not plies & 7:
+                self.check_time()
@@ -0,0 +1,370 @@
+"""Run agents in separate processes that speak a line-based protocol over
+their standard input and output, and referee games between such engines
+with wall-clock deadlines.
+
+Running every agent in its own interpreter means that one agent's garbage
+collection, runaway search or GIL contention cannot eat into the other
+agent's clock, and an agent that never checks its timer cannot hang the
+match: the referee stops waiting at the deadline and either kills the late
+engine or ignores its eventual reply.
+
+Protocol (one command per line, fields separated by spaces)::
+
+    referee -> engine                 engine -> referee
+    isolation                         ready <agent name>
+    position <width> <height> [r,c ...]
+    go <id> <milliseconds>            bestmove <id> <row> <col>
+    quit
+
+`position` describes the game by the moves played from the empty board, the
+same list of [row, column] pairs `Board.play` returns.  `go` asks for a move
+within the given time; the id is echoed in the reply so that replies that
+arrive after their deadline can be recognized and discarded.  An engine with
+no legal moves answers `bestmove <id> -1 -1`.
+
+    python engine.py AB_Improved                # serve one agent
+    python engine.py --match AB_Custom AB_Improved -n 10
+"""
+import argparse
+import os
+import queue
+import subprocess
+import sys
+import threading
+import timeit
+import traceback
+
+from agents import AGENTS, make_agent
+from isolation import Board
+from tournament import random_opening
+
+TIME_LIMIT = 150  # number of milliseconds per move
+
+NO_MOVE = (-1, -1)
+
+
+class EngineError(Exception):
+    """Raised when an engine process violates the protocol or exits. """
+    pass
+
+
+def format_position(width, height, moves):
+    """Return the `position` command for a game with the given moves. """
+    return " ".join(["position", str(width), str(height)] +
+                    ["{},{}".format(r, c) for r, c in moves])
+
+
+def parse_position(fields):
+    """Parse the arguments of a `position` command.
+
+    Returns
+    -------
+    (int, int, list<(int, int)>)
+        The board width, height and the moves played from the empty board.
+    """
+    width, height = int(fields[0]), int(fields[1])
+    moves = [tuple(int(x) for x in field.split(",")) for field in fields[2:]]
+    return width, height, moves
+
+
+def parse_bestmove(line):
+    """Parse a `bestmove` reply.
+
+    Returns
+    -------
+    (int, (int, int))
+        The id of the `go` command being answered and the move.
+    """
+    fields = line.split()
+    if len(fields) != 4 or fields[0] != "bestmove":
+        raise EngineError("Unexpected reply from engine: {!r}".format(line))
+    return int(fields[1]), (int(fields[2]), int(fields[3]))
+
+
+class EngineHost:
+    """Serve an in-process player (any object with a get_move() method, such
+    as the `IsolationPlayer` subclasses) over the engine protocol.
+
+    Parameters
+    ----------
+    player : object
+        The agent answering `go` commands.
+
+    name : str (optional)
+        The name reported in the handshake.
+
+    margin : float (optional)
+        Milliseconds subtracted from every time limit to cover the time
+        spent passing messages between the processes.
+    """
+
+    def __init__(self, player, name=None, margin=1.):
+        self.player = player
+        self.name = name or type(player).__name__
+        self.margin = margin
+        self.position = (7, 7, [])
+
+    def handle(self, line):
+        """Execute one protocol command.
+
+        Returns
+        -------
+        str or None
+            The reply to send back, if the command has one.
+        """
+        fields = line.split()
+        if not fields:
+            return None
+        command = fields[0]
+        if command == "isolation":
+            return "ready {}".format(self.name)
+        if command == "position":
+            self.position = parse_position(fields[1:])
+            return None
+        if command == "go":
+            move = self.search(float(fields[2]) - self.margin)
+            return "bestmove {} {} {}".format(fields[1], *move)
+        raise EngineError("Unknown command: {!r}".format(line))
+
+    def search(self, time_limit):
+        """Ask the player for a move in the current position. """
+        start = timeit.default_timer()
+        time_left = lambda: time_limit - 1000 * (timeit.default_timer() -
+                                                 start)
+        width, height, moves = self.position
+        # The opponent is only a placeholder registered on the board
+        if len(moves) % 2 == 0:
+            game = Board(self.player, "Opponent", width, height)
+        else:
+            game = Board("Opponent", self.player, width, height)
+        for move in moves:
+            game.apply_move(move)
+        if not game.get_legal_moves():
+            return NO_MOVE
+        move = self.player.get_move(game, time_left)
+        return NO_MOVE if move is None else move
+
+    def serve(self, stdin=sys.stdin, stdout=sys.stdout):
+        """Answer commands from `stdin` until `quit` or end of input. """
+        for line in stdin:
+            if line.strip() == "quit":
+                break
+            try:
+                reply = self.handle(line)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+                reply = None
+                if line.startswith("go"):
+                    reply = "bestmove {} -1 -1".format(line.split()[1])
+            if reply is not None:
+                stdout.write(reply + "\n")
+                stdout.flush()
+
+
+def engine_command(agent_name):
+    """Return the command line that serves a registered agent. """
+    script = os.path.abspath(__file__)
+    return [sys.executable, script, agent_name]
+
+
+class EngineProcess:
+    """The referee's handle on an engine running in a child process.
+
+    Parameters
+    ----------
+    command : list<str>
+        The command line starting the engine, e.g. engine_command(name).
+
+    name : str (optional)
+        A label for the engine in results and error messages.
+    """
+
+    def __init__(self, command, name=None):
+        self.command = command
+        self.name = name or " ".join(command)
+        self.process = None
+        self._next_id = 0
+        self.start()
+
+    def start(self, timeout=10.):
+        """Start the engine process and wait for its handshake. """
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            universal_newlines=True, bufsize=1)
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=self._read_lines,
+                                  args=(self.process.stdout, self._lines),
+                                  daemon=True)
+        reader.start()
+        self.send("isolation")
+        line = self._read(timeout)
+        if line is None or not line.startswith("ready"):
+            self.kill()
+            raise EngineError("{} did not complete the handshake".format(
+                self.name))
+
+    @staticmethod
+    def _read_lines(stream, lines):
+        for line in stream:
+            lines.put(line.strip())
+        lines.put(None)
+
+    def _read(self, timeout):
+        """Return the next line from the engine, or None on timeout. """
+        try:
+            line = self._lines.get(timeout=max(timeout, 0.))
+        except queue.Empty:
+            return None
+        if line is None:
+            raise EngineError("{} exited".format(self.name))
+        return line
+
+    def send(self, line):
+        try:
+            self.process.stdin.write(line + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise EngineError("{} exited".format(self.name))
+
+    def get_move(self, width, height, moves, time_limit):
+        """Request a move and wait for it until the deadline.
+
+        Returns
+        -------
+        ((int, int) or None, float)
+            The move, or None if the engine missed the deadline, and the
+            wall-clock milliseconds spent waiting.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        start = timeit.default_timer()
+        self.send(format_position(width, height, moves))
+        self.send("go {} {:g}".format(request_id, time_limit))
+        while True:
+            elapsed = 1000 * (timeit.default_timer() - start)
+            line = self._read((time_limit - elapsed) / 1000)
+            elapsed = 1000 * (timeit.default_timer() - start)
+            if line is None or elapsed > time_limit:
+                return None, elapsed
+            reply_id, move = parse_bestmove(line)
+            # Replies to earlier requests arrive late and are discarded
+            if reply_id == request_id:
+                return move, elapsed
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def restart(self):
+        self.kill()
+        self.start()
+
+    def close(self):
+        """Ask the engine to quit, killing it if it does not. """
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            self.send("quit")
+            self.process.wait(timeout=1.)
+        except (EngineError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def play_engines(engine_1, engine_2, opening=(), time_limit=TIME_LIMIT,
+                 width=7, height=7, on_timeout="kill"):
+    """Referee a game between two engine processes.
+
+    Parameters
+    ----------
+    engine_1, engine_2 : EngineProcess
+        The first and second player.
+
+    opening : list<(int, int)> (optional)
+        Moves applied before the engines are asked to play.
+
+    time_limit : numeric (optional)
+        The wall-clock milliseconds allowed per move.
+
+    on_timeout : str (optional)
+        "kill" restarts an engine that missed its deadline, so the next game
+        starts with a responsive process; "ignore" leaves it running and
+        discards its late reply.
+
+    Returns
+    ----------
+    (EngineProcess, list<[int, int]>, str)
+        The winning engine, the move history after the opening and the
+        termination reason, in the format of `Board.play()`.
+    """
+    game = Board(engine_1, engine_2, width=width, height=height)
+    moves = []
+    for move in opening:
+        game.apply_move(move)
+        moves.append(tuple(move))
+
+    move_history = []
+    while True:
+        engine = game.active_player
+        legal_player_moves = game.get_legal_moves()
+        curr_move, _ = engine.get_move(width, height, moves, time_limit)
+
+        if curr_move is None:
+            if on_timeout == "kill":
+                engine.restart()
+            return game.inactive_player, move_history, "timeout"
+
+        if curr_move not in legal_player_moves:
+            if len(legal_player_moves) > 0:
+                return game.inactive_player, move_history, "forfeit"
+            return game.inactive_player, move_history, "illegal move"
+
+        move_history.append(list(curr_move))
+        moves.append(curr_move)
+        game.apply_move(curr_move)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("agent", nargs="?", choices=list(AGENTS),
+                        help="serve this agent over stdin/stdout")
+    parser.add_argument("--match", nargs=2, metavar="AGENT",
+                        choices=list(AGENTS),
+                        help="referee games between two engine processes")
+    parser.add_argument("-n", "--rounds", type=int, default=5,
+                        help="number of openings played with each colour")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    args = parser.parse_args()
+
+    if args.agent:
+        EngineHost(make_agent(args.agent), args.agent).serve()
+        return
+    if not args.match:
+        parser.error("either an agent to serve or --match is required")
+
+    engines = [EngineProcess(engine_command(name), name)
+               for name in args.match]
+    wins = {engine: 0 for engine in engines}
+    try:
+        for _ in range(args.rounds):
+            opening = random_opening()
+            for first, second in (engines, engines[::-1]):
+                winner, _, termination = play_engines(
+                    first, second, opening, args.time_limit)
+                wins[winner] += 1
+                print("{} vs {}: {} wins ({})".format(
+                    first.name, second.name, winner.name, termination))
+    finally:
+        for engine in engines:
+            engine.close()
+    print(", ".join("{}: {}".format(e.name, wins[e]) for e in engines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""A bounded cache of heuristic evaluations for any score function.
+
+Iterative deepening scores the same leaf positions again in every pass, and
+consecutive moves revisit much of the previous tree, so expensive score
+functions such as `custom_score` are worth caching:
+
+    player = AlphaBetaPlayer(score_fn=EvalCache(custom_score))
+
+Entries are keyed by the position hash (`Board.hash()`) and by whether the
+evaluated player is the one to move, which together identify the player, and
+the least recently used entry is evicted once the cache is full.  The cache
+is separate from any transposition table: it stores heuristic values only,
+never search results.
+"""
+from collections import OrderedDict
+
+CACHE_SIZE = 2 ** 17  # number of evaluations kept
+
+
+class EvalCache(object):
+    """Wrap a score function with an LRU cache of its results.
+
+    Parameters
+    ----------
+    score_fn : callable
+        The score function to cache; it must depend only on the position and
+        the evaluated player.
+
+    size : int (optional)
+        The maximum number of cached evaluations.
+
+    Attributes
+    ----------
+    hits, misses, evictions : int
+        Counters since the cache was created or last cleared.
+    """
+
+    def __init__(self, score_fn, size=CACHE_SIZE):
+        self.score_fn = score_fn
+        self.size = size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Only offer batches when the wrapped function does, so that
+        # alpha-beta keeps scoring other functions one leaf at a time
+        if hasattr(score_fn, "evaluate_batch"):
+            self.evaluate_batch = self._evaluate_batch
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def _store(self, key, score):
+        self._entries[key] = score
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __call__(self, game, player):
+        key = (game.hash(), player == game.active_player)
+        entries = self._entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+        self.misses += 1
+        score = self.score_fn(game, player)
+        self._store(key, score)
+        return score
+
+    def _evaluate_batch(self, games, player):
+        """Score several positions, passing only the uncached ones on to the
+        wrapped function's evaluate_batch().
+        """
+        entries = self._entries
+        keys = [(game.hash(), player == game.active_player) for game in games]
+        scores = [None] * len(games)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in entries:
+                entries.move_to_end(key)
+                scores[i] = entries[key]
+            else:
+                missing.append(i)
+        self.hits += len(games) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            computed = self.score_fn.evaluate_batch(
+                [games[i] for i in missing], player)
+            for i, score in zip(missing, computed):
+                scores[i] = float(score)
+                self._store(keys[i], scores[i])
+        return scores
+
+    def __repr__(self):
+        name = getattr(self.score_fn, "__qualname__", None) or repr(
+            self.score_fn)
+        return "EvalCache({}, size={})".format(name, self.size)
@@ -0,0 +1,260 @@
+"""Learned evaluation functions: a fixed feature vector per position scored by
+a linear model or a small multi-layer perceptron with NumPy.
+
+An `Evaluator` is a drop-in score function (`evaluator(game, player)`), and
+also scores a list of positions in one call with `evaluate_batch()`.
+`AlphaBetaPlayer` uses the batched form for all the children of a frontier
+node, so the feature extraction and the matrix products run once per
+frontier node rather than once per leaf, which is what makes a learned
+evaluator affordable within the per-move time limit.
+
+Weights are stored in .npz or JSON files with the arrays
+
+    w, b              linear model: score = features . w + b
+    W1, b1, W2, b2    MLP: score = relu(features . W1 + b1) . W2 + b2
+    mean, std         optional feature normalization applied first
+
+Linear weights can be fitted to the outcomes recorded by selfplay.py:
+
+    python evaluator.py selfplay/*.bin.gz -o weights.npz
+"""
+import argparse
+import gzip
+import hashlib
+import json
+
+import numpy as np
+
+from isolation.batch import knight_table
+
+FEATURES = ("own_moves", "opp_moves", "own_moves_2", "opp_moves_2",
+            "own_centrality", "opp_centrality", "own_border", "opp_border",
+            "own_region", "opp_region", "blank_fraction")
+
+# Hand-set linear weights used when no weight file is given: the "improved"
+# mobility difference with small second-order and region terms
+DEFAULT_WEIGHTS = {
+    "w": np.array([1., -1., .1, -.1, 0., 0., 0., 0., .05, -.05, 0.]),
+    "b": np.array(0.),
+}
+
+_TABLES = {}
+
+
+def _tables(width, height):
+    """Return the knight table, squared distance from the centre and border
+    flag of every cell, with an extra always-blocked off-board cell whose
+    knight moves all lead off the board.
+    """
+    key = (width, height)
+    if key not in _TABLES:
+        cells = width * height
+        table = np.vstack([knight_table(width, height),
+                           np.full((1, 8), cells, dtype=np.intp)])
+        rows = np.arange(cells) % height
+        cols = np.arange(cells) // height
+        centrality = np.append((rows - (height - 1) / 2) ** 2 +
+                               (cols - (width - 1) / 2) ** 2, 0.)
+        border = np.append((rows == 0) | (rows == height - 1) |
+                           (cols == 0) | (cols == width - 1), False)
+        _TABLES[key] = (table, centrality, border)
+    return _TABLES[key]
+
+
+def extract_features(blocked, own, opp, width, height):
+    """Compute the feature vectors of a batch of positions.
+
+    Parameters
+    ----------
+    blocked : ndarray<bool> (n, cells)
+        The occupancy of every cell, indexed as row + column * height.
+
+    own, opp : ndarray<int> (n,)
+        The cell of the player being evaluated and of the opponent, or -1
+        for a player that has not moved yet.
+
+    Returns
+    -------
+    ndarray<float> (n, len(FEATURES))
+    """
+    n, cells = blocked.shape
+    table, centrality, border = _tables(width, height)
+    rows = np.arange(n)[:, None]
+    # The extra column is the off-board cell, which is always blocked
+    free = np.concatenate([~blocked, np.zeros((n, 1), dtype=bool)], axis=1)
+    blanks = free.sum(axis=1)
+    degrees = free[:, table].sum(axis=2)
+
+    columns = []
+    for location in (own, opp):
+        placed = location >= 0
+        loc = np.where(placed, location, cells)
+        targets = table[loc]
+        moves = free[rows, targets]
+        mobility = np.where(placed, moves.sum(axis=1), blanks)
+        second = np.where(moves, degrees[rows, targets], 0).sum(axis=1)
+        exposure = (moves & border[targets]).sum(axis=1)
+
+        # Flood fill the cells reachable by knight moves over free cells
+        reach = np.zeros((n, cells + 1), dtype=bool)
+        reach[np.nonzero(placed)[0], loc[placed]] = True
+        while True:
+            grown = reach | reach[:, table].any(axis=2) & free
+            if (grown == reach).all():
+                break
+            reach = grown
+        region = np.where(placed, reach[:, :-1].sum(axis=1) - 1, blanks)
+        columns.append((mobility, second, np.where(placed, centrality[loc],
+                                                   0.),
+                        np.where(placed, exposure, 0), region))
+
+    (own_m, own_2, own_c, own_b, own_r), (opp_m, opp_2, opp_c, opp_b,
+                                          opp_r) = columns
+    return np.stack([own_m, opp_m, own_2, opp_2, own_c, opp_c, own_b, opp_b,
+                     own_r, opp_r, blanks / cells], axis=1).astype(float)
+
+
+def unpack_masks(masks, cells):
+    """Convert integer occupancy masks to a boolean (n, cells) array. """
+    size = (cells + 7) // 8
+    data = np.frombuffer(b"".join(mask.to_bytes(size, "little")
+                                  for mask in masks), dtype=np.uint8)
+    return np.unpackbits(data.reshape(len(masks), size), axis=1,
+                         bitorder="little")[:, :cells].astype(bool)
+
+
+def load_weights(path):
+    """Load a weight file (.npz or JSON) into a dict of arrays. """
+    if path.endswith(".json"):
+        with open(path) as f:
+            return {key: np.asarray(value, dtype=float)
+                    for key, value in json.load(f).items()}
+    with np.load(path) as data:
+        return {key: data[key].astype(float) for key in data.files}
+
+
+def save_weights(path, weights):
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump({key: np.asarray(value).tolist()
+                       for key, value in weights.items()}, f, indent=2)
+    else:
+        np.savez(path, **weights)
+
+
+class Evaluator:
+    """A score function applying trained weights to the FEATURES of a
+    position.
+
+    Parameters
+    ----------
+    weights : dict or str (optional)
+        The weight arrays, or the path of a weight file; DEFAULT_WEIGHTS if
+        None.
+    """
+
+    def __init__(self, weights=None):
+        if weights is None:
+            weights = DEFAULT_WEIGHTS
+        elif isinstance(weights, str):
+            weights = load_weights(weights)
+        self.weights = {key: np.asarray(value, dtype=float)
+                        for key, value in weights.items()}
+        if not ("w" in self.weights or "W1" in self.weights):
+            raise ValueError("Weights must define either w or W1")
+
+    def __repr__(self):
+        # Stable across processes, so agent fingerprints stay valid
+        digest = hashlib.sha1()
+        for key in sorted(self.weights):
+            digest.update(key.encode() + self.weights[key].tobytes())
+        return "Evaluator({})".format(digest.hexdigest()[:12])
+
+    def predict(self, features):
+        """Score a (n, len(FEATURES)) array of feature vectors. """
+        w = self.weights
+        x = features
+        if "mean" in w:
+            x = (x - w["mean"]) / w["std"]
+        if "W1" in w:
+            hidden = np.maximum(x @ w["W1"] + w["b1"], 0.)
+            return hidden @ w["W2"].reshape(-1) + w["b2"]
+        return x @ w["w"] + w["b"]
+
+    def evaluate_batch(self, games, player):
+        """Score several positions of the same game from the point of view of
+        `player`, with terminal positions scored as +inf and -inf.
+
+        Returns
+        -------
+        ndarray<float>
+            One score per position.
+        """
+        if not games:
+            return np.zeros(0)
+        first = games[0]
+        width, height = first.width, first.height
+        states = [game._state for game in games]
+        blocked = unpack_masks([state.blocked for state in states],
+                               width * height)
+        own_side = 0 if player == first._player_1 else 1
+        own = np.array([state.locations[own_side] for state in states])
+        opp = np.array([state.locations[own_side ^ 1] for state in states])
+        features = extract_features(blocked, own, opp, width, height)
+        scores = self.predict(features)
+
+        # The player to move with no moves has lost
+        to_move = np.array([game.active_player == player for game in games])
+        scores = np.where(to_move & (features[:, 0] == 0), -np.inf, scores)
+        return np.where(~to_move & (features[:, 1] == 0), np.inf, scores)
+
+    def __call__(self, game, player):
+        return float(self.evaluate_batch([game], player)[0])
+
+
+def fit_linear(paths, ridge=1e-3):
+    """Fit linear weights that predict the game outcome (+1/-1 for the player
+    to move) of the positions in self-play shards by ridge regression.
+    """
+    # Imported here since selfplay.py imports the agent registry, which in
+    # turn registers agents using this module
+    from selfplay import HEADER, read_shard
+
+    xs = []
+    ys = []
+    for path in paths:
+        with gzip.open(path, "rb") as f:
+            _, _, width, height, _ = HEADER.unpack(f.read(HEADER.size))
+        records = list(read_shard(path))
+        if not records:
+            continue
+        blocked = unpack_masks([r.blocked for r in records], width * height)
+        own = np.array([r.active for r in records])
+        opp = np.array([r.inactive for r in records])
+        xs.append(extract_features(blocked, own, opp, width, height))
+        ys.append(np.array([r.outcome for r in records], dtype=float))
+    x = np.concatenate(xs)
+    y = np.concatenate(ys)
+    mean = x.mean(axis=0)
+    std = x.std(axis=0) + 1e-9
+    z = np.concatenate([(x - mean) / std, np.ones((len(x), 1))], axis=1)
+    solution = np.linalg.solve(z.T @ z + ridge * np.eye(z.shape[1]), z.T @ y)
+    return {"w": solution[:-1], "b": solution[-1], "mean": mean, "std": std}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("shards", nargs="+",
+                        help="self-play shards written by selfplay.py")
+    parser.add_argument("-o", "--out", default="weights.npz")
+    parser.add_argument("--ridge", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    weights = fit_linear(args.shards, args.ridge)
+    save_weights(args.out, weights)
+    for name, value in zip(FEATURES, weights["w"]):
+        print("{:>16} {:+.4f}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,36 @@ test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
 
+from collections import namedtuple
 from random import random
 
+from itertools import islice
+
+from isolation.bitboard import NOT_MOVED, board_bits, iter_bits, popcount
+from isolation.features import NodeFeatures
+from isolation.geometry import geometry
+
 _MAX_SCORE = float("inf")
 _MIN_SCORE = float("-inf")
 _DELIM = '>'
 
-"""
-Experimentally determined number of average moves per game,
-depending on board size, e.g. it takes ~35.5 moves to play on 7x7 board
-"""
-_AVG_MOVES = {49: 35.5}
+# Selective search: moves after the first LMR_FULL_MOVES at nodes with at
+# least LMR_MIN_DEPTH plies left are searched one ply shallower
+LMR_MIN_DEPTH = 3
+LMR_FULL_MOVES = 3
+
+# A player that has not moved yet only considers this many of the blank
+# cells nearest to the centre, so that the first moves on large boards do
+# not branch over every cell; the standard 7x7 board is never restricted
+OPENING_CANDIDATES = 49
+
+
+# One ranked root move of an analysis: its score for the player to move and
+# the principal variation starting with the move
+Line = namedtuple("Line", ["move", "score", "pv"])
+
+# The result of one completed iteration of AlphaBetaPlayer.analyze()
+Analysis = namedtuple("Analysis", ["depth", "lines", "nodes"])
 
 
 class SearchTimeout(Exception):
@@ -21,7 +40,48 @@ class SearchTimeout(Exception):
     pass
 
 
-def custom_score(game, player):
+class SearchStats:
+    """Counters collected by a search agent during one call to get_move().
+
+    Attributes
+    ----------
+    nodes : int
+        Number of interior nodes expanded by the search
+
+    evaluations : int
+        Number of calls to the heuristic score function
+
+    depth : int
+        Deepest search iteration that completed before the timeout
+
+    extensions : int
+        Number of forced (single reply) nodes searched without using a ply
+
+    reductions, re_searches : int
+        Number of late moves searched at reduced depth, and how many of them
+        had to be searched again at full depth
+
+    futility_prunes : int
+        Number of moves near the horizon skipped on their static score
+
+    partial_moves : int
+        Number of root moves completed by the iteration the timeout
+        interrupted; when there are any, the best of them is played
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.evaluations = 0
+        self.depth = 0
+        self.extensions = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.futility_prunes = 0
+        self.partial_moves = 0
+
+
+def custom_score(game, player, aggressiveness=1.5, aggressiveness_moves=None,
+                 deep_switch=0.5):
     """
     Calcualtes score based on sum of moves available several levels deep
 
@@ -37,31 +97,56 @@ def custom_score(game, player):
         A player instance in the current game (i.e., an object corresponding to
         one of the player objects `game.__player_1__` or `game.__player_2__`.)
 
+    aggressiveness : float (optional)
+        Weight of the opponent's moves at the start of the game
+
+    aggressiveness_moves : float (optional)
+        Number of moves over which the weight of the opponent's moves grows
+        by one; defaults to the average game length for the board size
+
+    deep_switch : float (optional)
+        Fraction of the board left blank below which moves are counted four
+        levels deep instead of two
+
     Returns
     -------
     float
         The heuristic value of the current game state to the specified player.
     """
-    if game.is_winner(player):
-        return _MAX_SCORE
-    if game.is_loser(player):
-        return _MIN_SCORE
-
-    blank_spaces = set(game.get_blank_spaces())
-    own_location = game.get_player_location(player)
-    opp_location = game.get_player_location(game.get_opponent(player))
-    # Getting slightly more aggressive towards the end of the game
-    # 35 is an average number of moves for 7x7 game (found experimentally)
-    aggressiveness = 1.5+game.move_count/35
+    features = NodeFeatures(game, player)
+    terminal = features.terminal_score
+    if terminal is not None:
+        return terminal
+    return deep_mobility_term(features, aggressiveness, aggressiveness_moves,
+                              deep_switch)
+
+
+def deep_mobility_term(features, aggressiveness=1.5, aggressiveness_moves=None,
+                       deep_switch=0.5):
+    """The non-terminal part of custom_score as a term over an
+    `isolation.features.NodeFeatures`, for use in blends.
+    """
+    game = features.game
+    blocked, own, opp = features.bits
+    geo = geometry(game.width, game.height)
+    masks = geo.masks
+    border = geo.border
+    free = geo.full & ~blocked
+    blank_spaces = popcount(free)
+    # Getting slightly more aggressive towards the end of the game, over
+    # the average number of moves for the board size
+    if aggressiveness_moves is None:
+        aggressiveness_moves = geo.average_moves
+    aggressiveness = aggressiveness+game.move_count/aggressiveness_moves
 
     # Searching deeper towards the end of the game
-    max_level = 4 if len(blank_spaces) < game.width*game.height/2 else 2
+    max_level = 4 if blank_spaces < game.width*game.height*deep_switch else 2
 
-    own_deep_moves = deep_moves_available(own_location, blank_spaces, max_level)
-    opp_deep_moves = deep_moves_available(opp_location, blank_spaces, max_level)
+    own_deep_moves = deep_moves_bits(own, free, max_level, masks, border)
+    opp_deep_moves = deep_moves_bits(opp, free, max_level, masks, border)
     # Need to normalize over the # of blank spaces to smoothen the "jump" when
     # switching from 2 to 4 levels of search
-    score = float(own_deep_moves - aggressiveness*opp_deep_moves)/(len(blank_spaces)*max_level)
+    score = float(own_deep_moves - aggressiveness*opp_deep_moves)/(blank_spaces*max_level)
 
     # THIS DOESN'T WORK.
     # Even though take_longest_path function works as expected, it doesn't
@@ -97,15 +182,21 @@ def custom_score_2(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    if game.is_winner(player):
-        return _MAX_SCORE
-    if game.is_loser(player):
-        return _MIN_SCORE
+    features = NodeFeatures(game, player)
+    terminal = features.terminal_score
+    if terminal is not None:
+        return terminal
+    return noisy_mobility_term(features)
+
 
-    own_moves = game.get_legal_moves(player)
-    opp_moves = game.get_legal_moves(game.get_opponent(player))
+def noisy_mobility_term(features):
+    """The non-terminal part of custom_score_2 as a term over an
+    `isolation.features.NodeFeatures`, for use in blends.
+    """
+    own_moves = features.own_mobility
+    opp_moves = features.opp_mobility
 
-    return float(len(own_moves) - (1+random())*len(opp_moves))
+    return float(own_moves - (1+random())*opp_moves)
 
 
 def take_longest_path(location, blank_spaces):
@@ -162,16 +253,48 @@ def deep_moves_available(location, blank_spaces, depth=2):
     return total_reachable
 
 
-def score_move(move):
+def deep_moves_bits(location, free, depth, masks, border):
+    """
+    The same count as deep_moves_available() over the bitboard
+    representation of `isolation.bitboard`, whose cost does not depend on
+    the size of the board. A player that has not moved yet can move to
+    any blank cell, and these moves are counted one level deep only.
+
+    Parameters
+    ----------
+    location : int
+        Player's cell index, or NOT_MOVED
+    free : int
+        Mask of the blank cells
+    depth : int
+        Current depth level
+    masks : list<int>
+        Knight moves from every cell as masks, see geometry()
+    border : int
+        Mask of the border cells
+    """
+    if location == NOT_MOVED:
+        return popcount(free) - 0.5*popcount(free & border)
+    moves = masks[location] & free
+    total_reachable = popcount(moves) - 0.5*popcount(moves & border)
+    if depth <= 0:
+        return total_reachable
+    free_left = free & ~moves
+    for move in iter_bits(moves):
+        total_reachable += deep_moves_bits(move, free_left, depth-1, masks,
+                                           border)
+    return total_reachable
+
+
+def score_move(move, width=7, height=7):
     """
     Score each move. Border moves are penalized
     """
-    return 0.5 if is_border_move(move) else 1
+    return 0.5 if is_border_move(move, width, height) else 1
 
 
-_BORDER_POSITIONS = [0, 6]
-def is_border_move(move):
-    return move[0] in _BORDER_POSITIONS or move[1] in _BORDER_POSITIONS
+def is_border_move(move, width=7, height=7):
+    return bool(geometry(width, height).border >> (move[0] + move[1]*height) & 1)
 
 
 directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
@@ -185,7 +308,7 @@ def get_moves(move, blank_spaces):
     return {m for m in moves if m in blank_spaces}
 
 
-def custom_score_3(game, player):
+def custom_score_3(game, player, border_discount=0.5, average_moves=None):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
 
@@ -201,30 +324,51 @@ def custom_score_3(game, player):
         A player instance in the current game (i.e., an object corresponding to
         one of the player objects `game.__player_1__` or `game.__player_2__`.)
 
+    border_discount : float (optional)
+        Discount of border moves at the start of the game
+
+    average_moves : float (optional)
+        Number of moves over which the discount grows by one; defaults to the
+        average game length for the board size
+
     Returns
     -------
     float
         The heuristic value of the current game state to the specified player.
     """
-    if game.is_winner(player):
-        return _MAX_SCORE
-    if game.is_loser(player):
-        return _MIN_SCORE
+    features = NodeFeatures(game, player)
+    terminal = features.terminal_score
+    if terminal is not None:
+        return terminal
+    return border_mobility_term(features, border_discount, average_moves)
 
-    average_moves = _AVG_MOVES.get(game.width*game.height, game.move_count)
-    border_move_discount = 0.5 + game.move_count/average_moves
-    own_moves = game.get_legal_moves(player)
-    opp_moves = game.get_legal_moves(game.get_opponent(player))
 
-    return float(len(own_moves)-border_move_discount*num_border_moves(own_moves, game)
-                 - len(opp_moves)+border_move_discount*num_border_moves(opp_moves, game))
+def border_mobility_term(features, border_discount=0.5, average_moves=None):
+    """The non-terminal part of custom_score_3 as a term over an
+    `isolation.features.NodeFeatures`, for use in blends.
+    """
+    game = features.game
+    geo = geometry(game.width, game.height)
+    if average_moves is None:
+        average_moves = geo.average_moves
+    border_move_discount = border_discount + game.move_count/average_moves
+    blocked, own, opp = features.bits
+    masks = geo.masks
+    free = geo.full & ~blocked
+    border = geo.border & free
+    own_moves = free if own == NOT_MOVED else masks[own] & free
+    opp_moves = free if opp == NOT_MOVED else masks[opp] & free
+
+    return float(popcount(own_moves)-border_move_discount*popcount(own_moves & border)
+                 - popcount(opp_moves)+border_move_discount*popcount(opp_moves & border))
 
 
 def num_border_moves(moves, game):
     """
     Utility function to calculate number of border moves
     """
-    return sum(1 for move in moves if is_border_move(move))
+    return sum(1 for move in moves
+               if is_border_move(move, game.width, game.height))
 
 
 class IsolationPlayer:
@@ -268,6 +412,10 @@ class MinimaxPlayer(IsolationPlayer):
     minimax to return a good move before the search time limit expires.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.):
+        super().__init__(search_depth, score_fn, timeout)
+        self.stats = SearchStats()
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -297,6 +445,7 @@ class MinimaxPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.stats = SearchStats()
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
@@ -305,7 +454,11 @@ class MinimaxPlayer(IsolationPlayer):
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            best_move = self.minimax(game, self.search_depth)
+            # minimax() returns a partial result when the timer expires
+            if self.time_left() >= self.TIMER_THRESHOLD:
+                self.stats.depth = self.search_depth
+            return best_move
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
 
@@ -360,12 +513,14 @@ class MinimaxPlayer(IsolationPlayer):
 
     def _max_value(self, game, player, plies_left):
         self.check_time()
+        self.stats.nodes += 1
         best_move = self.NO_MOVE
         best_score = _MIN_SCORE
         try:
             for move in game.get_legal_moves():
                 current_game = game.forecast_move(move)
                 if plies_left <= 1:
+                    self.stats.evaluations += 1
                     current_score = self.score(current_game, player)
                 else:
                     current_score, _ = self._min_value(current_game,
@@ -379,12 +534,14 @@ class MinimaxPlayer(IsolationPlayer):
 
     def _min_value(self, game, player, plies_left):
         self.check_time()
+        self.stats.nodes += 1
         best_move = self.NO_MOVE
         best_score = _MAX_SCORE
         try:
             for move in game.get_legal_moves():
                 current_game = game.forecast_move(move)
                 if plies_left <= 1:
+                    self.stats.evaluations += 1
                     current_score = self.score(current_game, player)
                 else:
                     current_score, _ = self._max_value(current_game,
@@ -401,8 +558,40 @@ class AlphaBetaPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    extend_forced : bool (optional)
+        Search positions with a single legal move without using up a ply.
+
+    late_move_reductions : bool (optional)
+        Order moves by the number of replies they leave the opponent and
+        search late moves one ply shallower, searching them again at full
+        depth if they turn out better than the moves before them.
+
+    futility_margin : float (optional)
+        Skip the search of a move two plies from the horizon when its static
+        score is worse than the best alternative by more than this margin,
+        in the units of the score function; None disables futility pruning.
+
+    opening_candidates : int (optional)
+        The number of blank cells nearest to the centre considered by a
+        player that has not moved yet; None considers every blank cell.
+
+    The other parameters are as for `IsolationPlayer`.  All selective search
+    options are off by default, so the search is exact to the given depth.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 extend_forced=False, late_move_reductions=False,
+                 futility_margin=None, opening_candidates=OPENING_CANDIDATES):
+        super().__init__(search_depth, score_fn, timeout)
+        self.stats = SearchStats()
+        self.extend_forced = extend_forced
+        self.late_move_reductions = late_move_reductions
+        self.futility_margin = futility_margin
+        self.opening_candidates = opening_candidates
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -434,20 +623,32 @@ class AlphaBetaPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.stats = SearchStats()
+        self._partial = (self.NO_MOVE, 0)
         best_move = self.NO_MOVE
 
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
+            moves = self._legal_moves(game)
             blank_spaces = game.get_blank_spaces()
             for depth in range(len(blank_spaces)):
-                move = self.alphabeta(game, depth+1)
+                # Search the best move of the last iteration first
+                if best_move in moves:
+                    moves.remove(best_move)
+                    moves.insert(0, best_move)
+                move = self._search_root(game, depth+1, moves)
+                self.stats.depth = depth+1
                 if move != self.NO_MOVE:
                     best_move = move
         except SearchTimeout:
-            pass  # Handle any actions required after timeout as needed
+            # The first root move of the interrupted iteration is the best
+            # move of the last completed one, so once it has been searched
+            # to the new depth, the best move so far is at least as good
+            move, self.stats.partial_moves = self._partial
+            if move != self.NO_MOVE:
+                best_move = move
 
-        # Return the best move from the last completed search iteration
         return best_move
 
     def alphabeta(self, game, depth, alpha=_MIN_SCORE, beta=_MAX_SCORE):
@@ -500,23 +701,265 @@ class AlphaBetaPlayer(IsolationPlayer):
                                        alpha, beta)
         return best_move
 
+    def _search_root(self, game, depth, moves):
+        """Return the best of the root `moves` searched to `depth`, keeping
+        the best move so far and the number of moves searched in
+        `self._partial` in case the search times out.
+        """
+        self.check_time()
+        self.stats.nodes += 1
+        self._partial = (self.NO_MOVE, 0)
+        player = game.active_player
+        best_move = self.NO_MOVE
+        best_score = _MIN_SCORE
+        leaf_scores = self._frontier_scores(game, player, depth, moves)
+        if leaf_scores is not None:
+            for move, current_score in zip(moves, leaf_scores):
+                if current_score > best_score:
+                    best_score = current_score
+                    best_move = move
+            return best_move
+        for searched, move in enumerate(moves, 1):
+            current_game = game.forecast_move(move)
+            if depth <= 1:
+                self.stats.evaluations += 1
+                current_score = self.score(current_game, player)
+            else:
+                current_score, _ = self._min_value(current_game, player,
+                                                   depth-1, best_score,
+                                                   _MAX_SCORE)
+            if current_score > best_score:
+                best_score = current_score
+                best_move = move
+            self._partial = (best_move, searched)
+        return best_move
+
+    def analyze(self, game, multipv=1, max_depth=None, time_left=None,
+                stop=None):
+        """Search `game` by iterative deepening and yield the best `multipv`
+        root moves with their scores and principal variations after every
+        completed depth.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The position to analyze.
+
+        multipv : int (optional)
+            The number of root moves to rank.
+
+        max_depth : int (optional)
+            The deepest iteration to search; by default the search continues
+            until every blank space could be filled.
+
+        time_left : callable (optional)
+            As for get_move(); the search has no time limit if None.
+
+        stop : threading.Event (optional)
+            Setting the event ends the analysis as if the time had run out.
+
+        Yields
+        ------
+        Analysis
+            The depth of the completed iteration, its `Line`s ordered from
+            best to worst, and the nodes searched so far.  The iteration in
+            progress when the search stops is discarded.
+        """
+        if time_left is None:
+            time_left = lambda: _MAX_SCORE
+        if stop is not None:
+            time_left = self._stoppable(time_left, stop)
+        self.time_left = time_left
+        self.stats = SearchStats()
+        moves = self._legal_moves(game)
+        if not moves:
+            return
+        if max_depth is None:
+            max_depth = len(game.get_blank_spaces())
+
+        try:
+            for depth in range(1, max_depth + 1):
+                lines = self._rank_root_moves(game, depth, moves, multipv)
+                self.stats.depth = depth
+                yield Analysis(depth, lines, self.stats.nodes)
+                # Search the best moves of this iteration first in the next
+                ranked = [line.move for line in lines]
+                moves = ranked + [m for m in moves if m not in ranked]
+        except SearchTimeout:
+            pass
+
+    @staticmethod
+    def _stoppable(time_left, stop):
+        return lambda: _MIN_SCORE if stop.is_set() else time_left()
+
+    def _rank_root_moves(self, game, depth, moves, multipv):
+        """Return the `Line`s of the best `multipv` root moves searched to
+        `depth`.  Each move only has to beat the worst of the best moves
+        found so far, so the others are pruned as in a single-PV search.
+        """
+        self.check_time()
+        self.stats.nodes += 1
+        player = game.active_player
+        best = []  # (score, move, reply) of the best moves, best first
+        for move in moves:
+            child = game.forecast_move(move)
+            alpha = best[-1][0] if len(best) == multipv else _MIN_SCORE
+            if depth <= 1:
+                self.stats.evaluations += 1
+                score, reply = self.score(child, player), self.NO_MOVE
+            else:
+                score, reply = self._min_value(child, player, depth-1,
+                                               alpha, _MAX_SCORE)
+            if len(best) < multipv or score > alpha:
+                best.append((score, move, reply))
+                best.sort(key=lambda entry: entry[0], reverse=True)
+                del best[multipv:]
+        return [Line(move, score, self.principal_variation(
+                    game, player, depth, [move, reply]))
+                for score, move, reply in best]
+
+    def principal_variation(self, game, player, depth, start=()):
+        """Return the line of best play from `game` to `depth` plies, found
+        by searching each position along it to the remaining depth.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The position the line starts from.
+
+        player : object
+            The player the scores are computed for.
+
+        depth : int
+            The length of the line to search for.
+
+        start : sequence<(int, int)> (optional)
+            Moves already known to start the line; NO_MOVE ends it.
+
+        Returns
+        -------
+        list<(int, int)>
+            The moves of the line, which is shorter than `depth` if the game
+            ends first.
+        """
+        line = []
+        for move in start:
+            if move == self.NO_MOVE or len(line) == depth:
+                return line
+            line.append(move)
+            game = game.forecast_move(move)
+        while len(line) < depth:
+            plies_left = depth - len(line)
+            if game.active_player == player:
+                _, move = self._max_value(game, player, plies_left,
+                                          _MIN_SCORE, _MAX_SCORE)
+            else:
+                _, move = self._min_value(game, player, plies_left,
+                                          _MIN_SCORE, _MAX_SCORE)
+            if move == self.NO_MOVE:
+                break
+            line.append(move)
+            game = game.forecast_move(move)
+        return line
+
+    def _frontier_scores(self, game, player, plies_left, moves):
+        """Score all children of a frontier node in one call when the score
+        function supports batches (see evaluator.py); None otherwise.
+        """
+        evaluate_batch = getattr(self.score, "evaluate_batch", None)
+        if plies_left > 1 or evaluate_batch is None or not moves:
+            return None
+        self.stats.evaluations += len(moves)
+        children = [game.forecast_move(move) for move in moves]
+        return list(evaluate_batch(children, player))
+
+    def _legal_moves(self, game):
+        """Return the legal moves of the active player, limited to the
+        opening candidates while the player has not moved yet.
+        """
+        # The players place themselves with the first two moves, on any
+        # blank cell
+        limit = self.opening_candidates
+        if (game.move_count >= 2 or limit is None or
+                game.width * game.height - game.move_count <= limit):
+            return game.get_legal_moves()
+        blocked, _, _ = board_bits(game)
+        height = game.height
+        central = (idx for idx in geometry(game.width, height).central_cells
+                   if not blocked >> idx & 1)
+        return [(idx % height, idx // height)
+                for idx in islice(central, limit)]
+
+    def _children(self, game, plies_left, moves):
+        """Return the (move, child position) pairs to search, ordered by the
+        number of replies left to the opponent when late moves are reduced.
+        Otherwise each child is only forecast when it is searched, so a
+        cutoff skips forecasting the rest.
+        """
+        if self.late_move_reductions and plies_left >= LMR_MIN_DEPTH:
+            children = [(move, game.forecast_move(move)) for move in moves]
+            children.sort(key=lambda child: child[1].mobility())
+            return children
+        return ((move, game.forecast_move(move)) for move in moves)
+
+    def _is_futile(self, child, player, plies_left, bound, maximizing):
+        """Return the static score of a child two plies from the horizon if
+        it cannot plausibly improve on `bound`, and None otherwise.
+        """
+        margin = self.futility_margin
+        if margin is None or plies_left != 2 or abs(bound) == _MAX_SCORE:
+            return None
+        self.stats.evaluations += 1
+        static = self.score(child, player)
+        if (static + margin <= bound if maximizing
+                else static - margin >= bound):
+            self.stats.futility_prunes += 1
+            return static
+        return None
+
     def _max_value(self, game, player, plies_left, alpha, beta):
         self.check_time()
+        self.stats.nodes += 1
         # log = get_log(plies_left, 'MAX')
         best_move = self.NO_MOVE
         best_score = _MIN_SCORE
-        moves = game.get_legal_moves()
+        moves = self._legal_moves(game)
         # log(f"legal moves {moves}")
-        for move in moves:
-            current_game = game.forecast_move(move)
-
+        if self.extend_forced and len(moves) == 1:
+            # A forced reply does not use up a ply of the search
+            self.stats.extensions += 1
+            plies_left += 1
+        leaf_scores = self._frontier_scores(game, player, plies_left, moves)
+        if leaf_scores is not None:
+            for move, current_score in zip(moves, leaf_scores):
+                if current_score > best_score:
+                    best_score = current_score
+                    best_move = move
+                if best_score >= beta:
+                    break
+            return best_score, best_move
+        for i, (move, current_game) in enumerate(
+                self._children(game, plies_left, moves)):
             if plies_left <= 1:
+                self.stats.evaluations += 1
                 current_score = self.score(current_game, player)
             else:
                 current_alpha = max(best_score, alpha)
-                current_score, _ = self._min_value(current_game,
-                                                   player, plies_left-1,
-                                                   current_alpha, beta)
+                current_score = self._is_futile(current_game, player,
+                                                plies_left, current_alpha,
+                                                True)
+                if current_score is None and self._is_late(i, plies_left):
+                    self.stats.reductions += 1
+                    current_score, _ = self._min_value(current_game, player,
+                                                       plies_left-2,
+                                                       current_alpha, beta)
+                    if current_score > current_alpha:
+                        self.stats.re_searches += 1
+                        current_score = None
+                if current_score is None:
+                    current_score, _ = self._min_value(current_game,
+                                                       player, plies_left-1,
+                                                       current_alpha, beta)
             if current_score > best_score:
                 best_score = current_score
                 best_move = move
@@ -528,20 +971,46 @@ class AlphaBetaPlayer(IsolationPlayer):
 
     def _min_value(self, game, player, plies_left, alpha, beta):
         self.check_time()
+        self.stats.nodes += 1
         # log = get_log(plies_left, 'MIN')
         best_move = self.NO_MOVE
         best_score = _MAX_SCORE
-        moves = game.get_legal_moves()
+        moves = self._legal_moves(game)
         # log(f"legal moves {moves}")
-        for move in moves:
-            current_game = game.forecast_move(move)
+        if self.extend_forced and len(moves) == 1:
+            self.stats.extensions += 1
+            plies_left += 1
+        leaf_scores = self._frontier_scores(game, player, plies_left, moves)
+        if leaf_scores is not None:
+            for move, current_score in zip(moves, leaf_scores):
+                if current_score < best_score:
+                    best_score = current_score
+                    best_move = move
+                if best_score <= alpha:
+                    break
+            return best_score, best_move
+        for i, (move, current_game) in enumerate(
+                self._children(game, plies_left, moves)):
             if plies_left <= 1:
+                self.stats.evaluations += 1
                 current_score = self.score(current_game, player)
             else:
                 current_beta = min(best_score, beta)
-                current_score, _ = self._max_value(current_game,
-                                                   player, plies_left-1,
-                                                   alpha, current_beta)
+                current_score = self._is_futile(current_game, player,
+                                                plies_left, current_beta,
+                                                False)
+                if current_score is None and self._is_late(i, plies_left):
+                    self.stats.reductions += 1
+                    current_score, _ = self._max_value(current_game, player,
+                                                       plies_left-2,
+                                                       alpha, current_beta)
+                    if current_score < current_beta:
+                        self.stats.re_searches += 1
+                        current_score = None
+                if current_score is None:
+                    current_score, _ = self._max_value(current_game,
+                                                       player, plies_left-1,
+                                                       alpha, current_beta)
             if current_score < best_score:
                 best_score = current_score
                 best_move = move
@@ -551,6 +1020,10 @@ class AlphaBetaPlayer(IsolationPlayer):
         # log(f"{best_move} -> {best_score}")
         return best_score, best_move
 
+    def _is_late(self, index, plies_left):
+        return (self.late_move_reductions and index >= LMR_FULL_MOVES and
+                plies_left >= LMR_MIN_DEPTH)
+
 
 def get_log(intend, prefix):
     def log(msg):
@@ -0,0 +1,226 @@
+"""
+This file contains a vectorized engine that plays many games of Isolation at
+once with NumPy.  All boards are held as arrays and advance one ply per step,
+so simple policies (random moves, or greedy moves scored like
+`open_move_score` and `improved_score` in sample_players.py) can be played
+for thousands of games at the cost of a few array operations per ply.
+
+NumPy is only required by this module; `isolation.Board` does not use it.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+POLICIES = ("random", "open_move", "improved")
+
+_DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+               (1, -2), (1, 2), (2, -1), (2, 1)]
+
+BatchResult = namedtuple("BatchResult", ["winners", "histories", "lengths"])
+
+
+def knight_table(width, height):
+    """Return a (cells, 8) array with the board index reached by each knight
+    move from every cell, using the index `width * height` (a cell that is
+    always blocked) for moves that leave the board.
+
+    Cells are indexed as row + column * height, like `isolation.Board`.
+    """
+    cells = width * height
+    table = np.full((cells, len(_DIRECTIONS)), cells, dtype=np.intp)
+    for c in range(width):
+        for r in range(height):
+            for i, (dr, dc) in enumerate(_DIRECTIONS):
+                if 0 <= r + dr < height and 0 <= c + dc < width:
+                    table[r + c * height, i] = (r + dr) + (c + dc) * height
+    return table
+
+
+class BatchBoards(object):
+    """A batch of independent Isolation games stored as arrays.
+
+    Parameters
+    ----------
+    num_games : int
+        The number of games in the batch.
+
+    width : int (optional)
+        The number of columns of every board.
+
+    height : int (optional)
+        The number of rows of every board.
+
+    seed : int (optional)
+        Seed for the random number generator used by the policies.
+    """
+    NOT_MOVED = -1
+
+    def __init__(self, num_games, width=7, height=7, seed=None):
+        self.num_games = num_games
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.rng = np.random.default_rng(seed)
+        self._neighbours = knight_table(width, height)
+        self._rows = np.arange(num_games)
+
+        # The extra last column is the always-blocked off-board cell
+        self.blocked = np.zeros((num_games, self.cells + 1), dtype=bool)
+        self.blocked[:, -1] = True
+        self.locations = np.full((num_games, 2), self.NOT_MOVED,
+                                 dtype=np.intp)
+        self.active = np.zeros(num_games, dtype=np.intp)
+        self.move_count = np.zeros(num_games, dtype=np.intp)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.winners = np.full(num_games, -1, dtype=np.intp)
+        self.histories = np.full((num_games, self.cells), -1, dtype=np.int16)
+
+    def apply_moves(self, moves, rows=None):
+        """Move the active player of each selected game to the given board
+        index.
+
+        Parameters
+        ----------
+        moves : array<int>
+            Board indices (row + column * height), one per selected game.
+
+        rows : array<int> (optional)
+            The games to advance; all games if None.
+        """
+        if rows is None:
+            rows = self._rows
+        self.blocked[rows, moves] = True
+        self.locations[rows, self.active[rows]] = moves
+        self.histories[rows, self.move_count[rows]] = moves
+        self.move_count[rows] += 1
+        self.active[rows] ^= 1
+
+    def free_degrees(self):
+        """Return a (num_games, cells + 1) array with the number of open
+        knight moves from every cell (0 for the off-board cell).
+        """
+        free = ~self.blocked
+        degrees = free[:, self._neighbours].sum(axis=2)
+        return np.concatenate(
+            [degrees, np.zeros((self.num_games, 1), dtype=degrees.dtype)],
+            axis=1)
+
+    def legal_mask(self, side=None):
+        """Return a (num_games, cells) boolean mask of the legal moves of the
+        given side (0 or 1) or of the active player of each game.
+        """
+        if side is None:
+            side = self.active
+        location = self.locations[self._rows, side]
+        placed = location != self.NOT_MOVED
+        mask = ~self.blocked[:, :-1]
+        targets = self._neighbours[location[placed]]
+        knight_mask = np.zeros((int(placed.sum()), self.cells + 1),
+                               dtype=bool)
+        knight_mask[np.arange(len(targets))[:, None], targets] = True
+        mask[placed] &= knight_mask[:, :-1]
+        return mask
+
+    def move_scores(self, legal, policy):
+        """Score every legal move of the active players with a greedy policy.
+
+        `open_move` scores a move by the number of moves open to the player
+        afterwards and `improved` by the difference to the opponent's open
+        moves.  Moves that leave the opponent without a move score +inf.
+        """
+        degrees = self.free_degrees()
+        opponent = self.locations[self._rows, self.active ^ 1]
+
+        # Opponent mobility after each move: moving onto one of the
+        # opponent's targets removes it; an unplaced opponent can go to any
+        # blank square except the one just taken
+        opp_targets = np.zeros((self.num_games, self.cells + 1), dtype=bool)
+        placed = opponent != self.NOT_MOVED
+        opp_targets[np.nonzero(placed)[0][:, None],
+                    self._neighbours[opponent[placed]]] = True
+        opp_targets = opp_targets[:, :-1] & ~self.blocked[:, :-1]
+        opp_moves = np.where(placed, degrees[self._rows, opponent],
+                             (~self.blocked[:, :-1]).sum(axis=1))
+        opp_after = opp_moves[:, None] - np.where(placed[:, None],
+                                                  opp_targets, True)
+
+        own_after = degrees[:, :-1].astype(float)
+        scores = own_after - opp_after if policy == "improved" else own_after
+        scores = np.where(opp_after == 0, np.inf, scores)
+        return np.where(legal, scores, -np.inf)
+
+    def select_moves(self, legal, policy):
+        """Choose one legal move per game, breaking ties at random. """
+        noise = self.rng.random(legal.shape)
+        if policy == "random":
+            return np.where(legal, noise, -1.).argmax(axis=1)
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy: {}".format(policy))
+        scores = self.move_scores(legal, policy)
+        # Rank by score first and use the noise only among equal scores
+        best = scores.max(axis=1, keepdims=True)
+        return np.where(legal & (scores == best), noise, -1.).argmax(axis=1)
+
+    def step(self, policies):
+        """Advance every unfinished game by one ply.
+
+        Parameters
+        ----------
+        policies : (str, str)
+            The policy of player 1 and player 2, each one of POLICIES.
+
+        Returns
+        -------
+        int
+            The number of games still in progress.
+        """
+        legal = self.legal_mask()
+        stuck = ~legal.any(axis=1) & ~self.done
+        self.winners[stuck] = self.active[stuck] ^ 1
+        self.done |= stuck
+
+        moves = np.zeros(self.num_games, dtype=np.intp)
+        for policy in set(policies):
+            sides = [side for side, p in enumerate(policies) if p == policy]
+            rows = np.nonzero(~self.done & np.isin(self.active, sides))[0]
+            if len(rows):
+                moves[rows] = self.select_moves(legal, policy)[rows]
+        rows = np.nonzero(~self.done)[0]
+        self.apply_moves(moves[rows], rows)
+        return len(rows)
+
+
+def simulate(num_games, policies=("random", "random"), width=7, height=7,
+             opening=None, seed=None):
+    """Play `num_games` games to completion between two vectorized policies.
+
+    Parameters
+    ----------
+    num_games : int
+        The number of games to play.
+
+    policies : (str, str) (optional)
+        The policy of player 1 and player 2, each one of POLICIES.
+
+    width, height : int (optional)
+        The board dimensions.
+
+    opening : list<(int, int)> (optional)
+        Moves (row, column) applied to every game before simulating.
+
+    seed : int (optional)
+        Seed for the random number generator.
+
+    Returns
+    -------
+    BatchResult
+        `winners` holds 0 where player 1 won and 1 where player 2 won,
+        `histories` the board index of every move (-1 after the end of the
+        game) and `lengths` the number of moves of each game.
+    """
+    boards = BatchBoards(num_games, width, height, seed)
+    for r, c in opening or []:
+        boards.apply_moves(np.full(num_games, r + c * height))
+    while boards.step(policies):
+        pass
+    return BatchResult(boards.winners, boards.histories, boards.move_count)
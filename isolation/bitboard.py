@@ -0,0 +1,198 @@
+"""
+This file contains helpers for representing Isolation positions as integer
+bitmasks, which is much cheaper than `Board` when a search or simulation
+needs to make and unmake millions of moves.
+
+Cells are indexed as row + column * height, the same order used internally
+by `Board`, and bit `i` of an occupancy mask is set when cell `i` is blocked.
+A player location is a cell index, or NOT_MOVED before the first move.
+"""
+NOT_MOVED = -1
+
+_DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+               (1, -2), (1, 2), (2, -1), (2, 1)]
+
+_TABLES = {}
+_SHIFTS = {}
+
+
+def move_tables(width, height):
+    """Return the knight-move lookup tables for a board geometry.
+
+    Returns
+    -------
+    (list<tuple<int>>, list<int>)
+        For every cell, the tuple of cell indices reachable by a knight move,
+        and the same set of cells as a bitmask. The tables are built once per
+        geometry and cached.
+    """
+    key = (width, height)
+    if key not in _TABLES:
+        targets = []
+        for c in range(width):
+            for r in range(height):
+                targets.append(tuple(
+                    (r + dr) + (c + dc) * height for dr, dc in _DIRECTIONS
+                    if 0 <= r + dr < height and 0 <= c + dc < width))
+        masks = [sum(1 << t for t in cell_targets) for cell_targets in targets]
+        _TABLES[key] = (targets, masks)
+    return _TABLES[key]
+
+
+def shift_tables(width, height):
+    """Return the knight moves of a board geometry as bit shifts.
+
+    Returns
+    -------
+    tuple<(int, int)>
+        For each knight direction, the shift that moves a cell index to the
+        target cell and the mask of cells whose target stays on the board.
+        The tables are built once per geometry and cached.
+    """
+    key = (width, height)
+    if key not in _SHIFTS:
+        shifts = []
+        for dr, dc in _DIRECTIONS:
+            source = 0
+            for c in range(width):
+                for r in range(height):
+                    if 0 <= r + dr < height and 0 <= c + dc < width:
+                        source |= 1 << (r + c * height)
+            shifts.append((dr + dc * height, source))
+        _SHIFTS[key] = tuple(shifts)
+    return _SHIFTS[key]
+
+
+def knight_spread(mask, shifts):
+    """Return the mask of all cells one knight move away from any cell in
+    `mask`, computed with one shift per direction.
+    """
+    spread = 0
+    for shift, source in shifts:
+        cells = mask & source
+        spread |= cells << shift if shift > 0 else cells >> -shift
+    return spread
+
+
+def _first_layer(location, free, shifts):
+    if location == NOT_MOVED:
+        return free
+    return knight_spread(1 << location, shifts) & free
+
+
+def bfs_layers(location, blocked, shifts, full):
+    """Return the cells a player can reach over open cells, grouped by the
+    number of moves needed.
+
+    Returns
+    -------
+    list<int>
+        The mask of cells first reached after 1, 2, ... moves.
+    """
+    free = full & ~blocked
+    frontier = _first_layer(location, free, shifts)
+    seen = frontier
+    layers = []
+    while frontier:
+        layers.append(frontier)
+        frontier = knight_spread(frontier, shifts) & free & ~seen
+        seen |= frontier
+    return layers
+
+
+def flood_fill(location, blocked, shifts, full):
+    """Return the mask of all open cells reachable from `location` (the
+    player's region), in one spread per BFS layer.
+    """
+    free = full & ~blocked
+    frontier = _first_layer(location, free, shifts)
+    region = frontier
+    while frontier:
+        frontier = knight_spread(frontier, shifts) & free & ~region
+        region |= frontier
+    return region
+
+
+def voronoi(blocked, own, opp, shifts, full):
+    """Split the open cells between two players by which one can reach them
+    in fewer moves; cells both reach in the same number of moves, or neither
+    reaches, belong to nobody.
+
+    Returns
+    -------
+    (int, int)
+        The masks of the cells reached first by `own` and by `opp`.
+    """
+    own_layers = bfs_layers(own, blocked, shifts, full)
+    opp_layers = bfs_layers(opp, blocked, shifts, full)
+    own_cells = opp_cells = own_seen = opp_seen = 0
+    for d in range(max(len(own_layers), len(opp_layers))):
+        own_seen |= own_layers[d] if d < len(own_layers) else 0
+        opp_seen |= opp_layers[d] if d < len(opp_layers) else 0
+        own_cells |= own_seen & ~opp_seen
+        opp_cells |= opp_seen & ~own_seen
+    return own_cells, opp_cells
+
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        """Return the number of set bits in a non-negative integer. """
+        return bin(mask).count("1")
+
+
+def iter_bits(mask):
+    """Generate the indices of the set bits of a non-negative integer. """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def board_bits(game):
+    """Extract the bitboard representation of an `isolation.Board`.
+
+    Returns
+    -------
+    (int, int, int)
+        The occupancy mask and the locations of the active and the inactive
+        player.
+    """
+    state = game._state
+    p1_loc, p2_loc = state.locations
+    if state.side:
+        return state.blocked, p2_loc, p1_loc
+    return state.blocked, p1_loc, p2_loc
+
+
+def legal_moves(blocked, location, targets, full):
+    """Return the list of cells the player at `location` can move to.
+
+    Parameters
+    ----------
+    blocked : int
+        The occupancy mask.
+
+    location : int
+        The cell of the player, or NOT_MOVED.
+
+    targets : list<tuple<int>>
+        The knight-move table returned by move_tables().
+
+    full : int
+        The mask with every cell of the board set.
+    """
+    if location == NOT_MOVED:
+        return list(iter_bits(full & ~blocked))
+    return [t for t in targets[location] if not blocked >> t & 1]
+
+
+def to_move(idx, height):
+    """Convert a cell index to a (row, column) move. """
+    return idx % height, idx // height
+
+
+def to_index(move, height):
+    """Convert a (row, column) move to a cell index. """
+    return move[0] + move[1] * height
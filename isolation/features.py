@@ -0,0 +1,221 @@
+"""
+This file contains `NodeFeatures`, a per-node view of a `Board` from one
+player's perspective that computes each basic quantity (legal moves of both
+players, locations, blank spaces, win/loss) at most once, and `Blend`, which
+composes score functions from terms over those features.
+
+A term is any callable taking a NodeFeatures and returning a number for a
+non-terminal position.  Several terms blended into one score function share
+a single NodeFeatures per evaluation, so a blend of heuristics costs little
+more than its most expensive component:
+
+    score_fn = Blend((1., improved_term), (0.1, center_term))
+
+Besides the terms for the sample heuristics, `region_term` and
+`voronoi_term` measure territory with the bit-parallel flood fill of
+`isolation.bitboard`.
+"""
+from .bitboard import (board_bits, flood_fill, popcount, shift_tables,
+                       voronoi)
+from .geometry import geometry
+
+_UNSET = object()
+
+
+class NodeFeatures(object):
+    """Lazily computed features of a game state for one player.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The game state being evaluated.
+
+    player : object
+        The player from whose point of view the state is evaluated.
+    """
+    __slots__ = ("game", "player", "_opponent", "_own_location",
+                 "_opp_location", "_own_moves", "_opp_moves", "_blank_spaces",
+                 "_blank_set", "_bits")
+
+    def __init__(self, game, player):
+        self.game = game
+        self.player = player
+        self._opponent = _UNSET
+        self._own_location = _UNSET
+        self._opp_location = _UNSET
+        self._own_moves = None
+        self._opp_moves = None
+        self._blank_spaces = None
+        self._blank_set = None
+        self._bits = None
+
+    @property
+    def opponent(self):
+        if self._opponent is _UNSET:
+            self._opponent = self.game.get_opponent(self.player)
+        return self._opponent
+
+    @property
+    def own_location(self):
+        if self._own_location is _UNSET:
+            self._own_location = self.game.get_player_location(self.player)
+        return self._own_location
+
+    @property
+    def opp_location(self):
+        if self._opp_location is _UNSET:
+            self._opp_location = self.game.get_player_location(self.opponent)
+        return self._opp_location
+
+    @property
+    def own_moves(self):
+        if self._own_moves is None:
+            self._own_moves = self.game.get_legal_moves(self.player)
+        return self._own_moves
+
+    @property
+    def opp_moves(self):
+        if self._opp_moves is None:
+            self._opp_moves = self.game.get_legal_moves(self.opponent)
+        return self._opp_moves
+
+    @property
+    def own_mobility(self):
+        """The number of legal moves of the player: the length of its list of
+        moves if already built, a popcount of the board's move mask if not.
+        """
+        if self._own_moves is not None:
+            return len(self._own_moves)
+        return self.game.mobility(self.player)
+
+    @property
+    def opp_mobility(self):
+        """The number of legal moves of the opponent. """
+        if self._opp_moves is not None:
+            return len(self._opp_moves)
+        return self.game.mobility(self.opponent)
+
+    @property
+    def blank_spaces(self):
+        """The list of blank cells, as returned by Board.get_blank_spaces(). """
+        if self._blank_spaces is None:
+            self._blank_spaces = self.game.get_blank_spaces()
+        return self._blank_spaces
+
+    @property
+    def blank_set(self):
+        if self._blank_set is None:
+            self._blank_set = set(self.blank_spaces)
+        return self._blank_set
+
+    @property
+    def bits(self):
+        """The occupancy mask and the cell indices of the player and the
+        opponent, as used by the functions in `isolation.bitboard`.
+        """
+        if self._bits is None:
+            blocked, active, inactive = board_bits(self.game)
+            if self.player == self.game.active_player:
+                self._bits = (blocked, active, inactive)
+            else:
+                self._bits = (blocked, inactive, active)
+        return self._bits
+
+    @property
+    def is_loser(self):
+        """Same as game.is_loser(player). """
+        return (self.player == self.game.active_player and
+                not self.own_mobility)
+
+    @property
+    def is_winner(self):
+        """Same as game.is_winner(player). """
+        return (self.player == self.game.inactive_player and
+                not self.opp_mobility)
+
+    @property
+    def terminal_score(self):
+        """-inf if the player has lost, +inf if the player has won, and None
+        while the game is still in progress.
+        """
+        if self.is_loser:
+            return float("-inf")
+        if self.is_winner:
+            return float("inf")
+        return None
+
+
+def open_move_term(features):
+    """The number of moves open to the player (see open_move_score). """
+    return features.own_mobility
+
+
+def improved_term(features):
+    """The difference in the number of open moves (see improved_score). """
+    return features.own_mobility - features.opp_mobility
+
+
+def center_term(features):
+    """The squared distance of the player from the centre of the board (see
+    center_score).
+    """
+    game = features.game
+    y, x = features.own_location
+    return geometry(game.width, game.height).centrality[y + x * game.height]
+
+
+def region_term(features):
+    """The difference in the number of cells each player can still reach. """
+    game = features.game
+    blocked, own, opp = features.bits
+    shifts = shift_tables(game.width, game.height)
+    full = geometry(game.width, game.height).full
+    return (popcount(flood_fill(own, blocked, shifts, full)) -
+            popcount(flood_fill(opp, blocked, shifts, full)))
+
+
+def voronoi_term(features):
+    """The difference in the number of cells each player reaches before the
+    other.
+    """
+    game = features.game
+    blocked, own, opp = features.bits
+    shifts = shift_tables(game.width, game.height)
+    full = geometry(game.width, game.height).full
+    own_cells, opp_cells = voronoi(blocked, own, opp, shifts, full)
+    return popcount(own_cells) - popcount(opp_cells)
+
+
+def _term_name(term):
+    keywords = getattr(term, "keywords", None)
+    if keywords is not None:
+        return "{}({})".format(_term_name(term.func), ", ".join(
+            "{}={!r}".format(k, v) for k, v in sorted(keywords.items())))
+    return getattr(term, "__qualname__", repr(term))
+
+
+class Blend(object):
+    """A score function summing weighted terms over one shared NodeFeatures,
+    with terminal positions scored as +inf and -inf.
+
+    Parameters
+    ----------
+    *terms : (float, callable)
+        The weight and term function of each component.
+    """
+
+    def __init__(self, *terms):
+        self.terms = [(float(weight), term) for weight, term in terms]
+
+    def __call__(self, game, player):
+        features = NodeFeatures(game, player)
+        terminal = features.terminal_score
+        if terminal is not None:
+            return terminal
+        return float(sum(weight * term(features)
+                         for weight, term in self.terms))
+
+    def __repr__(self):
+        return "Blend({})".format(", ".join(
+            "({!r}, {})".format(weight, _term_name(term))
+            for weight, term in self.terms))
@@ -0,0 +1,161 @@
+"""
+This file contains the registry of per-geometry lookup tables used by the
+heuristics.  `geometry(width, height)` builds the tables of a board size
+once and caches them, so a heuristic reads a precomputed value instead of
+repeating the geometry arithmetic at every evaluation:
+
+    geo = geometry(game.width, game.height)
+    geo.centrality[idx]        # squared distance of cell idx from the centre
+    geo.border & mask          # the border cells in a mask of cells
+    geo.average_moves          # average number of moves in a game
+
+Cells are indexed as row + column * height, as in `isolation.bitboard`.
+
+The average game length of the standard 7x7 board was measured from
+tournament games.  The lengths of the other square boards from 4x4 to
+15x15 and of a few larger ones were calibrated offline by a seeded self-play
+run of greedy mobility players, scaled so that the same run on 7x7 matches
+the measured length, and are listed in CALIBRATED_MOVES.  Any other size gets
+the measured length scaled by its number of cells, so building the tables
+never plays a game during a search.  A program that uses an unlisted size
+can call `calibrate(width, height)` once before its games start, and
+
+    python -m isolation.geometry 9x6 11x8
+
+prints the calibrated lengths of board sizes to add to the table.
+"""
+import random
+import sys
+
+from collections import namedtuple
+
+from .bitboard import move_tables
+from .state import BoardState
+
+# Average game lengths measured from tournament games between search agents
+AVERAGE_MOVES = {(7, 7): 35.5}
+
+# Average game lengths from calibrate_average_moves(), which is deterministic
+CALIBRATED_MOVES = {
+    (4, 4): 16.4, (5, 5): 19.8, (6, 6): 25.7, (8, 8): 48.5, (9, 9): 59.0,
+    (10, 10): 74.0, (11, 11): 89.2, (12, 12): 103.9, (13, 13): 119.0,
+    (14, 14): 139.7, (15, 15): 161.1, (20, 20): 274.8, (25, 25): 411.5,
+    (30, 30): 583.1}
+
+REFERENCE_SIZE = (7, 7)  # the measured size the calibration is scaled to
+CALIBRATION_GAMES = 64  # self-play games per calibrated board size
+
+# The lookup tables of one board size: the masks of every cell and of the
+# border cells, the squared distance of every cell from the centre as in
+# center_score, every cell ordered from the centre outwards, the knight-move
+# tables of bitboard.move_tables() and the average number of moves in a game
+Geometry = namedtuple("Geometry", [
+    "width", "height", "full", "border", "centrality", "central_cells",
+    "targets", "masks", "average_moves"])
+
+_GEOMETRIES = {}
+_GREEDY_LENGTHS = {}
+
+
+def _greedy_game_length(width, height, games, seed):
+    """Return the average number of moves in self-play games between greedy
+    players that maximize their mobility advantage one move ahead, with
+    random placements and a little noise to vary the games.
+    """
+    key = (width, height, games, seed)
+    if key not in _GREEDY_LENGTHS:
+        rng = random.Random(seed)
+        total = 0
+        for _ in range(games):
+            state = BoardState(width, height)
+            for _ in range(2):
+                state.apply(rng.choice(state.legal_moves(state.side)))
+            while True:
+                moves = state.legal_moves(state.side)
+                if not moves:
+                    break
+                best_score = best_move = None
+                for move in moves:
+                    undo = state.apply(move)
+                    score = (state.mobility(state.side ^ 1) -
+                             state.mobility(state.side) + .5 * rng.random())
+                    state.undo(undo)
+                    if best_score is None or score > best_score:
+                        best_score, best_move = score, move
+                state.apply(best_move)
+            total += state.move_count
+        _GREEDY_LENGTHS[key] = total / games
+    return _GREEDY_LENGTHS[key]
+
+
+def calibrate_average_moves(width, height, games=CALIBRATION_GAMES, seed=0):
+    """Estimate the average game length of a board size with a fast greedy
+    self-play run, scaled by the ratio of the measured to the self-play
+    length on the reference board.
+    """
+    scale = (AVERAGE_MOVES[REFERENCE_SIZE] /
+             _greedy_game_length(*REFERENCE_SIZE, games=games, seed=seed))
+    return scale * _greedy_game_length(width, height, games, seed)
+
+
+def average_moves(width, height):
+    """Return the average game length of a board size: measured, calibrated
+    or, for an unlisted size, estimated from the number of cells.
+    """
+    key = (width, height)
+    if key in AVERAGE_MOVES:
+        return AVERAGE_MOVES[key]
+    if key in CALIBRATED_MOVES:
+        return CALIBRATED_MOVES[key]
+    ref_width, ref_height = REFERENCE_SIZE
+    return (AVERAGE_MOVES[REFERENCE_SIZE] * width * height /
+            (ref_width * ref_height))
+
+
+def calibrate(width, height, games=CALIBRATION_GAMES, seed=0):
+    """Calibrate the average game length of a board size and use it in its
+    tables from then on.  This plays greedy self-play games, so call it
+    before the search starts rather than from a heuristic.
+    """
+    key = (width, height)
+    if key not in AVERAGE_MOVES:
+        CALIBRATED_MOVES[key] = calibrate_average_moves(width, height,
+                                                        games, seed)
+        if key in _GEOMETRIES:
+            _GEOMETRIES[key] = _GEOMETRIES[key]._replace(
+                average_moves=CALIBRATED_MOVES[key])
+    return geometry(width, height)
+
+
+def geometry(width, height):
+    """Return the lookup tables of a board size, built on first use. """
+    key = (width, height)
+    if key not in _GEOMETRIES:
+        cells = width * height
+        rows = [idx % height for idx in range(cells)]
+        cols = [idx // height for idx in range(cells)]
+        w, h = width / 2., height / 2.
+        centrality = tuple(float((h - y)**2 + (w - x)**2)
+                           for y, x in zip(rows, cols))
+        targets, masks = move_tables(width, height)
+        _GEOMETRIES[key] = Geometry(
+            width=width, height=height, full=(1 << cells) - 1,
+            border=sum(1 << idx for idx in range(cells)
+                       if rows[idx] in (0, height - 1) or
+                       cols[idx] in (0, width - 1)),
+            centrality=centrality,
+            central_cells=tuple(sorted(
+                range(cells),
+                key=lambda idx: ((rows[idx] - (height - 1) / 2)**2 +
+                                 (cols[idx] - (width - 1) / 2)**2, idx))),
+            targets=targets, masks=masks,
+            average_moves=average_moves(width, height))
+    return _GEOMETRIES[key]
+
+
+if __name__ == "__main__":
+    sizes = [tuple(int(side) for side in size.split("x"))
+             for size in sys.argv[1:]] or sorted(CALIBRATED_MOVES)
+    for width, height in sizes:
+        print("({}, {}): {:.1f},".format(
+            width, height, calibrate_average_moves(width, height)))
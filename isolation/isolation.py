@@ -8,11 +8,20 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 import random
+import struct
 import timeit
-from copy import copy
+from array import array
+
+from .bitboard import NOT_MOVED, iter_bits, popcount
+from .state import BoardState
 
 TIME_LIMIT_MILLIS = 150
 
+# Header of Board.to_bytes(): width, height, index of the player to move and
+# the cells of player 1 and player 2 (-1 before their first move), followed
+# by the little-endian occupancy mask
+_BYTES_HEADER = struct.Struct("<BBBhh")
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -40,34 +49,106 @@ class Board(object):
     def __init__(self, player_1, player_2, width=7, height=7):
         self.width = width
         self.height = height
-        self.move_count = 0
         self._player_1 = player_1
         self._player_2 = player_2
-        self._active_player = player_1
-        self._inactive_player = player_2
-
-        # The last 3 entries of the board state includes initiative (0 for
-        # player 1, 1 for player 2) player 2 last move, and player 1 last move
-        self._board_state = [Board.BLANK] * (width * height + 3)
-        self._board_state[-1] = Board.NOT_MOVED
-        self._board_state[-2] = Board.NOT_MOVED
+        self._players = (player_1, player_2)
+
+        # The position itself, with the players as sides 0 and 1; the board
+        # only maps player objects to sides
+        self._state = BoardState(width, height)
+        self._undo_stack = []
+
+    @classmethod
+    def _from_state(cls, player_1, player_2, width, height, blocked, p1_loc,
+                    p2_loc, side):
+        """Build a board from the occupancy mask, the cell of each player
+        (None if not placed) and the index of the player to move.
+        """
+        board = cls(player_1, player_2, width, height)
+        state = board._state
+        state.blocked = blocked
+        state.locations = (NOT_MOVED if p1_loc is None else p1_loc,
+                           NOT_MOVED if p2_loc is None else p2_loc)
+        state.side = side
+        state.move_count = popcount(blocked)
+        state.rehash()
+        return board
+
+    def to_bytes(self):
+        """Encode the position, without the player objects, in a few bytes
+        plus one bit per cell; the inverse of Board.from_bytes().
+        """
+        state = self._state
+        return (_BYTES_HEADER.pack(self.width, self.height, state.side,
+                                   *state.locations) +
+                state.blocked.to_bytes((self.width * self.height + 7) // 8,
+                                       "little"))
+
+    @classmethod
+    def from_bytes(cls, data, player_1="Player1", player_2="Player2"):
+        """Decode a position encoded with Board.to_bytes() into a board
+        between `player_1` and `player_2`.
+        """
+        width, height, side, p1_loc, p2_loc = _BYTES_HEADER.unpack_from(data)
+        blocked = int.from_bytes(data[_BYTES_HEADER.size:], "little")
+        return cls._from_state(player_1, player_2, width, height, blocked,
+                               None if p1_loc < 0 else p1_loc,
+                               None if p2_loc < 0 else p2_loc, side)
+
+    @classmethod
+    def from_string(cls, text, player_1="Player1", player_2="Player2",
+                    symbols=('1', '2')):
+        """Parse the output of Board.to_string() into a board between
+        `player_1` and `player_2`.  Every move blocks one cell, so the player
+        to move follows from the number of blocked cells.
+        """
+        rows = [line.strip('\r') for line in text.split('\n')]
+        rows = [line.split('|')[1:-1] for line in rows[1:] if '|' in line]
+        height = len(rows)
+        blocked = 0
+        locations = {}
+        for i, row in enumerate(rows):
+            for j, cell in enumerate(row):
+                mark = cell.strip()
+                if mark:
+                    blocked |= 1 << (i + j * height)
+                if mark in symbols:
+                    locations[mark] = i + j * height
+        return cls._from_state(player_1, player_2, len(rows[0]), height,
+                               blocked, locations.get(symbols[0]),
+                               locations.get(symbols[1]),
+                               popcount(blocked) % 2)
 
     def hash(self):
-        return str(self._board_state).__hash__()
+        return self._state.zobrist
+
+    @property
+    def move_count(self):
+        """The number of moves applied since the empty board. """
+        return self._state.move_count
 
     @property
     def active_player(self):
         """The object registered as the player holding initiative in the
         current game state.
         """
-        return self._active_player
+        return self._players[self._state.side]
 
     @property
     def inactive_player(self):
         """The object registered as the player in waiting for the current
         game state.
         """
-        return self._inactive_player
+        return self._players[self._state.side ^ 1]
+
+    def _side(self, player, caller):
+        """Return 0 for player 1 and 1 for player 2. """
+        if player == self._player_1:
+            return 0
+        if player == self._player_2:
+            return 1
+        raise RuntimeError(
+            "Invalid player in {}: {}".format(caller, player))
 
     def get_opponent(self, player):
         """Return the opponent of the supplied player.
@@ -84,19 +165,27 @@ class Board(object):
         object
             The opponent of the input player object.
         """
-        if player == self._active_player:
-            return self._inactive_player
-        elif player == self._inactive_player:
-            return self._active_player
+        if player == self.active_player:
+            return self.inactive_player
+        elif player == self.inactive_player:
+            return self.active_player
         raise RuntimeError("`player` must be an object registered as a player in the current game.")
 
     def copy(self):
-        """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
-        new_board.move_count = self.move_count
-        new_board._active_player = self._active_player
-        new_board._inactive_player = self._inactive_player
-        new_board._board_state = copy(self._board_state)
+        """ Return a deep copy of the current board.
+
+        The moves applied before the copy was made cannot be taken back on
+        the copy with undo_move().
+        """
+        # Bypass __init__, which would build state that is replaced here
+        new_board = Board.__new__(Board)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._players = self._players
+        new_board._state = self._state.copy()
+        new_board._undo_stack = []
         return new_board
 
     def forecast_move(self, move):
@@ -134,13 +223,15 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
-                self._board_state[idx] == Board.BLANK)
+                self._state.is_blank(idx))
 
     def get_blank_spaces(self):
         """Return a list of the locations that are still available on the board.
         """
-        return [(i, j) for j in range(self.width) for i in range(self.height)
-                if self._board_state[i + j * self.height] == Board.BLANK]
+        height = self.height
+        state = self._state
+        return [(idx % height, idx // height)
+                for idx in iter_bits(state.full & ~state.blocked)]
 
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
@@ -156,21 +247,34 @@ class Board(object):
             The coordinate pair (row, column) of the input player, or None
             if the player has not moved.
         """
-        if player == self._player_1:
-            if self._board_state[-1] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-1]
-        elif player == self._player_2:
-            if self._board_state[-2] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-2]
-        else:
-            raise RuntimeError(
-                "Invalid player in get_player_location: {}".format(player))
+        idx = self._state.locations[
+            self._side(player, "get_player_location")]
+        if idx == NOT_MOVED:
+            return Board.NOT_MOVED
         w = idx // self.height
         h = idx % self.height
         return (h, w)
 
+    def mobility(self, player=None):
+        """Return the number of legal moves of the specified player, the same
+        as len(self.get_legal_moves(player)), without building the list.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the mobility of the active player on the board.
+
+        Returns
+        -------
+        int
+            The number of legal moves open to the player.
+        """
+        state = self._state
+        if player is None:
+            return state.mobility(state.side)
+        return state.mobility(self._side(player, "mobility"))
+
     def get_legal_moves(self, player=None):
         """Return the list of all legal moves for the specified player.
 
@@ -186,9 +290,17 @@ class Board(object):
             The list of coordinate pairs (row, column) of all legal moves
             for the player constrained by the current game state.
         """
+        state = self._state
         if player is None:
-            player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+            side = state.side
+        else:
+            side = self._side(player, "get_legal_moves")
+        height = self.height
+        moves = [(idx % height, idx // height)
+                 for idx in state.legal_moves(side)]
+        if state.locations[side] != NOT_MOVED:
+            random.shuffle(moves)
+        return moves
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -200,20 +312,23 @@ class Board(object):
             the active player on the board.
         """
         idx = move[0] + move[1] * self.height
-        last_move_idx = int(self.active_player == self._player_2) + 1
-        self._board_state[-last_move_idx] = idx
-        self._board_state[idx] = 1
-        self._board_state[-3] ^= 1
-        self._active_player, self._inactive_player = self._inactive_player, self._active_player
-        self.move_count += 1
+        self._undo_stack.append(self._state.apply(idx))
+
+    def undo_move(self):
+        """Take back the last move applied to the board. """
+        self._state.undo(self._undo_stack.pop())
 
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        state = self._state
+        return (player == self.inactive_player and
+                not state.mobility(state.side))
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        state = self._state
+        return (player == self.active_player and
+                not state.mobility(state.side))
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,31 +352,16 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self.mobility():
 
-            if player == self._inactive_player:
+            if player == self.inactive_player:
                 return float("inf")
 
-            if player == self._active_player:
+            if player == self.active_player:
                 return float("-inf")
 
         return 0.
 
-    def __get_moves(self, loc):
-        """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
-        """
-        if loc == Board.NOT_MOVED:
-            return self.get_blank_spaces()
-
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
-        return valid_moves
-
     def print_board(self):
         """DEPRECATED - use Board.to_string()"""
         return self.to_string()
@@ -271,8 +371,8 @@ class Board(object):
         the location of each player and indicating which cells have been
         blocked, and which remain open.
         """
-        p1_loc = self._board_state[-1]
-        p2_loc = self._board_state[-2]
+        p1_loc, p2_loc = self._state.locations
+        blocked = self._state.blocked
 
         col_margin = len(str(self.height - 1)) + 1
         prefix = "{:<" + "{}".format(col_margin) + "}"
@@ -282,7 +382,7 @@ class Board(object):
             out += prefix.format(i) + ' | '
             for j in range(self.width):
                 idx = i + j * self.height
-                if not self._board_state[idx]:
+                if not blocked >> idx & 1:
                     out += ' '
                 elif p1_loc == idx:
                     out += symbols[0]
@@ -323,20 +423,74 @@ class Board(object):
 
             move_start = time_millis()
             time_left = lambda : time_limit - (time_millis() - move_start)
-            curr_move = self._active_player.get_move(game_copy, time_left)
+            curr_move = self.active_player.get_move(game_copy, time_left)
             move_end = time_left()
 
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
 
             if move_end < 0:
-                return self._inactive_player, move_history, "timeout"
+                return self.inactive_player, move_history, "timeout"
 
             if curr_move not in legal_player_moves:
                 if len(legal_player_moves) > 0:
-                    return self._inactive_player, move_history, "forfeit"
-                return self._inactive_player, move_history, "illegal move"
+                    return self.inactive_player, move_history, "forfeit"
+                return self.inactive_player, move_history, "illegal move"
 
             move_history.append(list(curr_move))
 
             self.apply_move(curr_move)
+
+    def play_fast(self, time_limit=None):
+        """Execute a match between trusted in-process players with as little
+        overhead as possible.
+
+        Unlike play(), the players receive the live board rather than a copy
+        and their moves are not validated, so this must only be used with
+        agents that are known to return legal moves and to leave the board
+        unmodified. Use play() to referee untrusted agents.
+
+        Parameters
+        ----------
+        time_limit : numeric (optional)
+            The maximum number of milliseconds to allow before timeout
+            during each turn. If None, the game is not timed and `time_left`
+            always returns infinity.
+
+        Returns
+        ----------
+        (player, array<int>, str)
+            Return multiple including the winning player, the move history
+            as an array of board indices (a move (row, column) is stored as
+            row + column * height), and a string indicating the reason for
+            losing (e.g., timeout or invalid move).
+        """
+        move_history = array('H')
+        height = self.height
+
+        if time_limit is None:
+            time_left = lambda: float("inf")
+        else:
+            deadline = [0.]
+            time_left = lambda: deadline[0] - 1000 * timeit.default_timer()
+
+        while True:
+
+            if time_limit is not None:
+                deadline[0] = 1000 * timeit.default_timer() + time_limit
+
+            curr_move = self.active_player.get_move(self, time_left)
+
+            if time_limit is not None and time_left() < 0:
+                return self.inactive_player, move_history, "timeout"
+
+            # Trusted players only pass when they are out of moves or out of
+            # time, so the legal moves are only needed to tell them apart
+            if curr_move is None or curr_move[0] < 0:
+                if self.mobility():
+                    return self.inactive_player, move_history, "forfeit"
+                return self.inactive_player, move_history, "illegal move"
+
+            move_history.append(curr_move[0] + curr_move[1] * height)
+
+            self.apply_move(curr_move)
@@ -0,0 +1,170 @@
+"""
+This file contains `BoardState`, the player-independent state of an
+Isolation game: the occupancy mask, the cells of both players and the side
+to move, all stored as ints.
+
+`Board` keeps its position in a BoardState and only maps the player objects
+it was created with to sides 0 (player 1) and 1 (player 2), so the search
+never compares player objects while making moves.  Cells are indexed as
+row + column * height and a player that has not moved yet is at NOT_MOVED,
+as in `isolation.bitboard`.
+
+Every state also carries a Zobrist hash that apply() and undo() update with
+a few XORs, so hashing a position costs the same on any board size.
+"""
+import random
+
+from .bitboard import NOT_MOVED, iter_bits, move_tables, popcount
+
+_ZOBRIST = {}
+
+
+def zobrist_keys(width, height):
+    """Return the random 64-bit keys of a board geometry: one per blocked
+    cell, one per cell for each player's location, and one for player 2 to
+    move.  The keys are the same in every process and cached.
+    """
+    key = (width, height)
+    if key not in _ZOBRIST:
+        rng = random.Random("zobrist:{}x{}".format(width, height))
+        cells = width * height
+        _ZOBRIST[key] = (
+            [rng.getrandbits(64) for _ in range(cells)],
+            ([rng.getrandbits(64) for _ in range(cells)],
+             [rng.getrandbits(64) for _ in range(cells)]),
+            rng.getrandbits(64))
+    return _ZOBRIST[key]
+
+
+class BoardState(object):
+    """The position of an Isolation game, with no reference to the players.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the board.
+
+    Attributes
+    ----------
+    blocked : int
+        The occupancy mask; bit i is set when cell i is blocked.
+
+    locations : (int, int)
+        The cells of player 1 and player 2, or NOT_MOVED.
+
+    side : int
+        The player to move: 0 for player 1, 1 for player 2.
+
+    move_count : int
+        The number of moves applied since the empty board.
+
+    zobrist : int
+        The Zobrist hash of the position.
+    """
+    __slots__ = ("width", "height", "blocked", "locations", "side",
+                 "move_count", "zobrist", "_targets", "_masks", "_keys")
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.blocked = 0
+        self.locations = (NOT_MOVED, NOT_MOVED)
+        self.side = 0
+        self.move_count = 0
+        self.zobrist = 0
+        self._targets, self._masks = move_tables(width, height)
+        self._keys = zobrist_keys(width, height)
+
+    def copy(self):
+        # Bypass __init__; the move tables are shared between copies
+        state = BoardState.__new__(BoardState)
+        state.width = self.width
+        state.height = self.height
+        state.blocked = self.blocked
+        state.locations = self.locations
+        state.side = self.side
+        state.move_count = self.move_count
+        state.zobrist = self.zobrist
+        state._targets = self._targets
+        state._masks = self._masks
+        state._keys = self._keys
+        return state
+
+    def rehash(self):
+        """Compute the Zobrist hash from scratch, after the position was
+        set directly rather than through apply().
+        """
+        cell_keys, location_keys, side_key = self._keys
+        zobrist = side_key if self.side else 0
+        for idx in iter_bits(self.blocked):
+            zobrist ^= cell_keys[idx]
+        for keys, location in zip(location_keys, self.locations):
+            if location != NOT_MOVED:
+                zobrist ^= keys[location]
+        self.zobrist = zobrist
+
+    @property
+    def full(self):
+        """The mask with every cell of the board set. """
+        return (1 << (self.width * self.height)) - 1
+
+    def apply(self, idx):
+        """Move the player to move to cell `idx`.
+
+        Returns
+        -------
+        (int, (int, int), int)
+            The occupancy mask, player cells and hash before the move, which
+            undo() takes to restore them.
+        """
+        undo = (self.blocked, self.locations, self.zobrist)
+        cell_keys, location_keys, side_key = self._keys
+        side = self.side
+        keys = location_keys[side]
+        previous = self.locations[side]
+        zobrist = self.zobrist ^ side_key ^ keys[idx]
+        if previous != NOT_MOVED:
+            zobrist ^= keys[previous]
+        if not self.blocked >> idx & 1:
+            zobrist ^= cell_keys[idx]
+            self.blocked |= 1 << idx
+        p1_loc, p2_loc = self.locations
+        self.locations = (p1_loc, idx) if side else (idx, p2_loc)
+        self.zobrist = zobrist
+        self.side = side ^ 1
+        self.move_count += 1
+        return undo
+
+    def undo(self, undo):
+        """Take back the last move, given the value apply() returned. """
+        self.blocked, self.locations, self.zobrist = undo
+        self.side ^= 1
+        self.move_count -= 1
+
+    def is_blank(self, idx):
+        return not self.blocked >> idx & 1
+
+    def mobility(self, side):
+        """Return the number of legal moves of a side.
+
+        This is a popcount of the move mask of the side's cell rather than a
+        lookup in a table of free-neighbour counts kept up to date by apply()
+        and undo(): copying such a table in every forecast_move() costs more
+        than the popcount saves.
+        """
+        location = self.locations[side]
+        if location == NOT_MOVED:
+            return popcount(self.full & ~self.blocked)
+        return popcount(self._masks[location] & ~self.blocked)
+
+    def legal_moves(self, side):
+        """Return the cells the player of a side can move to. """
+        location = self.locations[side]
+        blocked = self.blocked
+        if location == NOT_MOVED:
+            return list(iter_bits(self.full & ~blocked))
+        return [t for t in self._targets[location] if not blocked >> t & 1]
+
+    def key(self):
+        """A hashable value identifying the position exactly. """
+        return (self.blocked, self.locations, self.side)
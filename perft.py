@@ -0,0 +1,159 @@
+"""Count the leaf nodes of the move-generation tree ("perft") from a set of
+fixed positions and report the throughput of each board backend.
+
+Every position is described by its board size and the moves played from the
+empty board, so the same position can be set up on any backend.  The leaf
+counts are checked against the stored reference values, which makes this
+script a correctness gate as well as a speed benchmark whenever the board
+core changes:
+
+    python perft.py                      # all backends, default depths
+    python perft.py --backend board -d 4 # one backend, deeper search
+"""
+import argparse
+import timeit
+
+from collections import namedtuple
+
+from isolation import Board
+from isolation import bitboard
+
+Position = namedtuple("Position", ["name", "width", "height", "moves"])
+
+POSITIONS = [
+    Position("empty-5x5", 5, 5, []),
+    Position("first-7x7", 7, 7, [(3, 3)]),
+    Position("opening-7x7", 7, 7, [(3, 3), (2, 4)]),
+    Position("midgame-7x7", 7, 7, [(0, 0), (6, 6), (1, 2), (4, 5), (3, 3),
+                                   (2, 4), (5, 4), (3, 2), (6, 2), (5, 1)]),
+    Position("endgame-7x7", 7, 7, [(3, 3), (3, 6), (4, 5), (4, 4), (6, 6),
+                                   (6, 5), (5, 4), (4, 6), (4, 2), (3, 4),
+                                   (2, 1), (2, 2), (0, 0), (0, 1), (1, 2),
+                                   (2, 0), (3, 1), (3, 2), (5, 2), (5, 1)]),
+    Position("opening-8x8", 8, 8, [(0, 0), (7, 7)]),
+    Position("opening-9x6", 9, 6, [(2, 2), (3, 6)]),
+]
+
+# Number of leaves at depth 1, 2, ... for every position in POSITIONS
+REFERENCE_COUNTS = {
+    "empty-5x5": [25, 600, 2208, 7712, 24160, 73248, 190528, 475040],
+    "first-7x7": [48, 376, 1712, 8256, 34848, 121760, 491552],
+    "opening-7x7": [8, 62, 296, 1144, 3984, 14124, 52044, 187990, 695844],
+    "midgame-7x7": [3, 8, 28, 89, 304, 1257, 4132, 13012, 37806],
+    "endgame-7x7": [3, 9, 11, 22, 32, 56, 85, 178, 273],
+    "opening-8x8": [2, 4, 20, 100, 500, 2392, 12192, 60092, 262064],
+    "opening-9x6": [8, 64, 234, 846, 3562, 14894, 59645, 239569, 863617],
+}
+
+DEFAULT_DEPTH = 5
+
+
+def setup_board(position):
+    """Return an `isolation.Board` with the moves of `position` applied. """
+    game = Board("Player1", "Player2", width=position.width,
+                 height=position.height)
+    for move in position.moves:
+        game.apply_move(move)
+    return game
+
+
+def board_perft(game, depth):
+    """Count the leaves `depth` plies below `game` using the public
+    `isolation.Board` interface.
+    """
+    if depth == 0:
+        return 1
+    moves = game.get_legal_moves()
+    if depth == 1:
+        return len(moves)
+    return sum(board_perft(game.forecast_move(move), depth - 1)
+               for move in moves)
+
+
+def setup_bitboard(position):
+    """Return the bitboard tuple (occupancy, active location, inactive
+    location, move table, full mask) for `position`.
+    """
+    targets, _ = bitboard.move_tables(position.width, position.height)
+    blocked, active, inactive = bitboard.board_bits(setup_board(position))
+    full = (1 << (position.width * position.height)) - 1
+    return blocked, active, inactive, targets, full
+
+
+def bitboard_perft(state, depth):
+    """Count the leaves `depth` plies below a position using the integer
+    bitmask representation of `isolation.bitboard`.
+    """
+    if depth == 0:
+        return 1
+    blocked, active, inactive, targets, full = state
+    moves = bitboard.legal_moves(blocked, active, targets, full)
+    if depth == 1:
+        return len(moves)
+    return sum(bitboard_perft((blocked | 1 << move, inactive, move, targets,
+                               full), depth - 1)
+               for move in moves)
+
+
+Backend = namedtuple("Backend", ["setup", "perft"])
+
+BACKENDS = {
+    "board": Backend(setup_board, board_perft),
+    "bitboard": Backend(setup_bitboard, bitboard_perft),
+}
+
+
+def run(backend, positions, depth):
+    """Run perft on every position with the given backend.
+
+    Returns
+    -------
+    list<(Position, int, int, float)>
+        The position, the leaf count, the reference count (None if no
+        reference is stored for that depth) and the elapsed seconds.
+    """
+    results = []
+    for position in positions:
+        state = backend.setup(position)
+        start = timeit.default_timer()
+        count = backend.perft(state, depth)
+        elapsed = timeit.default_timer() - start
+        reference = REFERENCE_COUNTS.get(position.name, [])
+        expected = reference[depth - 1] if depth <= len(reference) else None
+        results.append((position, count, expected, elapsed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-b", "--backend", choices=sorted(BACKENDS),
+                        action="append",
+                        help="backend to benchmark (default: all)")
+    parser.add_argument("-d", "--depth", type=int, default=DEFAULT_DEPTH,
+                        help="number of plies to expand")
+    parser.add_argument("-p", "--position", action="append",
+                        choices=[p.name for p in POSITIONS],
+                        help="position to expand (default: all)")
+    args = parser.parse_args()
+
+    positions = [p for p in POSITIONS
+                 if not args.position or p.name in args.position]
+    failures = 0
+    print("{:<10}{:<14}{:>12}{:>12}{:>10}{:>14}".format(
+        "Backend", "Position", "Leaves", "Expected", "Seconds", "Nodes/sec"))
+    for name in args.backend or sorted(BACKENDS):
+        for position, count, expected, elapsed in run(
+                BACKENDS[name], positions, args.depth):
+            status = ""
+            if expected is not None and count != expected:
+                status = "  MISMATCH"
+                failures += 1
+            print("{:<10}{:<14}{:>12}{:>12}{:>10.3f}{:>14.0f}{}".format(
+                name, position.name, count,
+                "-" if expected is None else expected, elapsed,
+                count / elapsed if elapsed else float("inf"), status))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
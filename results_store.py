@@ -0,0 +1,98 @@
+"""Persist finished tournament games to a SQLite database so that an
+interrupted tournament resumes where it stopped.
+
+Every game is stored under a key built from the configuration fingerprints
+of both agents (see `agents.agent_fingerprint`), the opening, the colours,
+the match number and the time limit.  Re-running a tournament with the same
+seed only plays the games that are not in the store yet -- after editing one
+heuristic, that is the games of the agents that use it.
+
+    python tournament.py --store results.db --seed 1
+"""
+import hashlib
+import json
+import sqlite3
+import time
+
+from agents import agent_fingerprint
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    key TEXT PRIMARY KEY,
+    cpu_agent TEXT NOT NULL,
+    test_agent TEXT NOT NULL,
+    match INTEGER NOT NULL,
+    test_first INTEGER NOT NULL,
+    opening TEXT NOT NULL,
+    time_limit REAL NOT NULL,
+    test_won INTEGER NOT NULL,
+    termination TEXT,
+    history TEXT NOT NULL,
+    finished REAL NOT NULL
+)
+"""
+
+
+class ResultStore:
+    """A SQLite file of finished games, keyed by GameSpec and the agent
+    configurations.
+
+    Parameters
+    ----------
+    path : str
+        The database file; it is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self._fingerprints = {}
+
+    def key(self, spec):
+        """Return the key under which the result of a GameSpec is stored. """
+        fingerprints = []
+        for name in (spec.cpu_agent, spec.test_agent):
+            if name not in self._fingerprints:
+                self._fingerprints[name] = agent_fingerprint(name)
+            fingerprints.append(self._fingerprints[name])
+        config = [fingerprints, [list(move) for move in spec.opening],
+                  bool(spec.test_first), spec.match, float(spec.time_limit)]
+        return hashlib.sha1(json.dumps(config).encode()).hexdigest()
+
+    def get(self, spec):
+        """Return the stored (test_won, termination, history) of a game, or
+        None if it has not been played.
+        """
+        row = self.connection.execute(
+            "SELECT test_won, termination, history FROM games WHERE key = ?",
+            (self.key(spec),)).fetchone()
+        if row is None:
+            return None
+        return bool(row[0]), row[1], json.loads(row[2])
+
+    def put(self, result):
+        """Store a GameResult; each game is committed as soon as it is
+        stored so that nothing is lost on a crash or Ctrl-C.
+        """
+        spec = result.spec
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO games VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(spec), spec.cpu_agent, spec.test_agent, spec.match,
+                 int(spec.test_first), json.dumps(
+                     [list(move) for move in spec.opening]),
+                 spec.time_limit, int(result.test_won), result.termination,
+                 json.dumps([list(move) for move in result.history]),
+                 time.time()))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
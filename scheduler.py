@@ -0,0 +1,256 @@
+"""Run the round-robin tournament of tournament.py on a bounded pool of
+engine processes driven by asyncio.
+
+Every agent runs as a separate engine process (see engine.py).  Only one of
+the two engines in a game is thinking at any time, so playing `--jobs` games
+at once keeps that many cores busy without oversubscribing them.  Engine
+processes are reused between games, per-move deadlines are enforced with
+asyncio timeouts, and results are printed as soon as each game finishes:
+
+    python scheduler.py --jobs 8 --rounds 20
+"""
+import argparse
+import asyncio
+
+from multiprocessing import cpu_count
+
+from agents import AGENTS
+from engine import (EngineError, engine_command, format_position,
+                    parse_bestmove)
+from isolation import Board
+from tournament import (NUM_MATCHES, TIME_LIMIT, TEST_AGENTS, CPU_AGENTS,
+                        GameResult, schedule_matches, print_results)
+
+
+class AsyncEngine:
+    """An engine process controlled from the asyncio event loop; the
+    counterpart of `engine.EngineProcess`.
+    """
+
+    def __init__(self, name, command):
+        self.name = name
+        self.command = command
+        self.process = None
+        self._next_id = 0
+
+    async def start(self, timeout=10.):
+        """Start the engine process and wait for its handshake. """
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE)
+        await self._send("isolation")
+        try:
+            line = await asyncio.wait_for(self._readline(), timeout)
+        except asyncio.TimeoutError:
+            line = ""
+        if not line.startswith("ready"):
+            await self.kill()
+            raise EngineError("{} did not complete the handshake".format(
+                self.name))
+        return self
+
+    async def _send(self, *lines):
+        try:
+            self.process.stdin.write("".join(
+                line + "\n" for line in lines).encode())
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise EngineError("{} exited".format(self.name))
+
+    async def _readline(self):
+        line = await self.process.stdout.readline()
+        if not line:
+            raise EngineError("{} exited".format(self.name))
+        return line.decode().strip()
+
+    async def get_move(self, width, height, moves, time_limit):
+        """Request a move and wait for it until the deadline.
+
+        Returns
+        -------
+        (int, int) or None
+            The move, or None if the engine missed the deadline.
+        """
+        loop = asyncio.get_running_loop()
+        self._next_id += 1
+        request_id = self._next_id
+        deadline = loop.time() + time_limit / 1000
+        await self._send(format_position(width, height, moves),
+                         "go {} {:g}".format(request_id, time_limit))
+        while True:
+            try:
+                line = await asyncio.wait_for(self._readline(),
+                                              deadline - loop.time())
+            except asyncio.TimeoutError:
+                return None
+            reply_id, move = parse_bestmove(line)
+            if reply_id == request_id:
+                return move
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def kill(self):
+        if self.alive:
+            self.process.kill()
+            await self.process.wait()
+
+    async def close(self):
+        """Ask the engine to quit, killing it if it does not. """
+        if not self.alive:
+            return
+        try:
+            await self._send("quit")
+            await asyncio.wait_for(self.process.wait(), 1.)
+        except (EngineError, asyncio.TimeoutError):
+            await self.kill()
+
+
+class EnginePool:
+    """Idle engine processes kept for reuse, keyed by agent name.
+
+    Parameters
+    ----------
+    max_idle : int
+        The number of idle engines kept per agent; surplus engines are shut
+        down when they are released.
+    """
+
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._idle = {}
+
+    async def acquire(self, name):
+        idle = self._idle.get(name)
+        if idle:
+            return idle.pop()
+        return await AsyncEngine(name, engine_command(name)).start()
+
+    async def release(self, engine):
+        """Return a healthy engine to the pool. """
+        idle = self._idle.setdefault(engine.name, [])
+        if engine.alive and len(idle) < self.max_idle:
+            idle.append(engine)
+        else:
+            await engine.close()
+
+    async def close(self):
+        engines = [e for idle in self._idle.values() for e in idle]
+        self._idle = {}
+        await asyncio.gather(*(engine.close() for engine in engines))
+
+
+async def play_game(pool, spec, width=7, height=7):
+    """Referee the game described by a GameSpec between pooled engines.
+
+    An engine that misses a deadline is killed rather than returned to the
+    pool, since it may still be searching.
+    """
+    engines = []
+    try:
+        for name in spec.players:
+            engines.append(await pool.acquire(name))
+        game = Board(*engines, width=width, height=height)
+        moves = [tuple(move) for move in spec.opening]
+        for move in moves:
+            game.apply_move(move)
+
+        termination = None
+        history = []
+        try:
+            while termination is None:
+                engine = game.active_player
+                legal_player_moves = game.get_legal_moves()
+                move = await engine.get_move(width, height, moves,
+                                             spec.time_limit)
+                if move is None:
+                    await engine.kill()
+                    termination = "timeout"
+                elif move not in legal_player_moves:
+                    termination = ("forfeit" if legal_player_moves
+                                   else "illegal move")
+                else:
+                    history.append(list(move))
+                    moves.append(move)
+                    game.apply_move(move)
+        except EngineError:
+            termination = "crash"
+    finally:
+        # Also return the first engine if the second could not be started
+        for engine in engines:
+            await pool.release(engine)
+
+    # The player to move when the game ended is the loser
+    test_index = 0 if spec.test_first else 1
+    test_won = game.active_player is not engines[test_index]
+    return GameResult(spec, test_won, termination, history)
+
+
+async def run_games(specs, jobs, width=7, height=7):
+    """Play all games with at most `jobs` games in progress at once.
+
+    Yields
+    ------
+    GameResult
+        The result of every game, in order of completion.
+    """
+    pool = EnginePool(max_idle=jobs)
+    slots = asyncio.Semaphore(jobs)
+
+    async def run(spec):
+        async with slots:
+            return await play_game(pool, spec, width, height)
+
+    tasks = [asyncio.ensure_future(run(spec)) for spec in specs]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pool.close()
+
+
+async def run_tournament(cpu_names, test_names, num_matches, time_limit,
+                         jobs):
+    specs = schedule_matches(cpu_names, test_names, num_matches, time_limit)
+    results = []
+    async for result in run_games(specs, jobs):
+        results.append(result)
+        spec = result.spec
+        winner = spec.test_agent if result.test_won else spec.cpu_agent
+        print("[{:>4}/{}] {} vs {}: {} wins ({})".format(
+            len(results), len(specs), *spec.players, winner,
+            result.termination), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-j", "--jobs", type=int, default=cpu_count(),
+                        help="number of games played concurrently")
+    parser.add_argument("-r", "--rounds", type=int, default=NUM_MATCHES,
+                        help="number of matches against each opponent")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    parser.add_argument("--test-agents", nargs="+", choices=list(AGENTS),
+                        default=TEST_AGENTS)
+    parser.add_argument("--cpu-agents", nargs="+", choices=list(AGENTS),
+                        default=CPU_AGENTS)
+    args = parser.parse_args()
+
+    results = asyncio.run(run_tournament(
+        args.cpu_agents, args.test_agents, args.rounds, args.time_limit,
+        args.jobs))
+
+    print()
+    print_results(args.cpu_agents, args.test_agents, results)
+    timeouts = sum(result.termination == "timeout" for result in results)
+    if timeouts:
+        print("There were {} timeouts during the tournament.".format(
+            timeouts))
+
+
+if __name__ == "__main__":
+    main()
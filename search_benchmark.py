@@ -0,0 +1,256 @@
+"""Measure how fast the search agents in game_agent.py search with each of
+the bundled heuristics over a fixed corpus of midgame and endgame positions.
+
+For every agent type, score function and position the benchmark records:
+
+  - the time to complete iterative deepening up to a fixed depth,
+  - the nodes and evaluations searched by the last (fixed depth) iteration,
+  - evaluations per second, and
+  - the depth of the last iteration completed within the turn time limit.
+
+Results can be saved as JSON and compared against an earlier run, which shows
+the cost/benefit trade-off of each heuristic in a way the tournament cannot:
+
+    python search_benchmark.py --save before.json
+    python search_benchmark.py --compare before.json
+
+The large corpus holds positions on 15x15 and 20x20 boards:
+
+    python search_benchmark.py --corpus large --player AlphaBeta
+"""
+import argparse
+import json
+import random
+import timeit
+
+from collections import OrderedDict
+
+from perft import Position, setup_board
+from sample_players import improved_score, center_score
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, SearchStats,
+                        SearchTimeout, custom_score, custom_score_2,
+                        custom_score_3)
+
+TIME_LIMIT = 150  # number of milliseconds per turn, as in tournament.py
+SEED = 1234  # fixes the move ordering of Board.get_legal_moves()
+
+CORPUS = [
+    Position("midgame-a", 7, 7, [(1, 1), (5, 2), (3, 2), (4, 0), (4, 4),
+                                 (6, 1), (5, 6), (5, 3), (6, 4), (3, 4)]),
+    Position("midgame-b", 7, 7, [(5, 1), (0, 5), (4, 3), (1, 3), (3, 1),
+                                 (3, 4), (1, 2), (2, 6), (0, 4), (4, 5)]),
+    Position("midgame-c", 7, 7, [(5, 0), (0, 4), (4, 2), (2, 3), (5, 4),
+                                 (3, 5), (6, 2), (1, 6), (4, 3), (2, 4),
+                                 (5, 5), (0, 3)]),
+    Position("midgame-d", 7, 7, [(0, 5), (1, 6), (2, 4), (3, 5), (0, 3),
+                                 (1, 4), (1, 1), (2, 2), (2, 3), (4, 3),
+                                 (1, 5), (6, 2)]),
+    Position("endgame-a", 7, 7, [(1, 1), (5, 2), (3, 2), (4, 0), (4, 4),
+                                 (6, 1), (5, 6), (5, 3), (6, 4), (3, 4),
+                                 (4, 5), (2, 2), (6, 6), (4, 3), (5, 4),
+                                 (5, 1), (3, 3), (3, 0), (1, 2), (4, 2)]),
+    Position("endgame-b", 7, 7, [(5, 1), (0, 5), (4, 3), (1, 3), (3, 1),
+                                 (3, 4), (1, 2), (2, 6), (0, 4), (4, 5),
+                                 (2, 5), (2, 4), (0, 6), (3, 2), (1, 4),
+                                 (2, 0), (3, 5), (4, 1), (5, 6), (5, 3)]),
+    Position("endgame-c", 7, 7, [(0, 4), (2, 0), (1, 2), (3, 2), (3, 1),
+                                 (1, 1), (2, 3), (0, 3), (3, 5), (1, 5),
+                                 (1, 4), (3, 6), (2, 2), (5, 5), (4, 1),
+                                 (3, 4), (5, 3), (4, 2), (4, 5), (6, 1)]),
+    Position("endgame-d", 7, 7, [(0, 5), (1, 6), (2, 4), (3, 5), (0, 3),
+                                 (1, 4), (1, 1), (2, 2), (2, 3), (4, 3),
+                                 (1, 5), (6, 2), (3, 6), (4, 1), (5, 5),
+                                 (6, 0), (3, 4), (5, 2), (4, 2), (4, 4)]),
+]
+
+# Positions on large boards, where the cost of move generation, hashing and
+# the heuristics must not grow with the number of cells
+LARGE_CORPUS = [
+    Position("opening-15x15", 15, 15, [(8, 7)]),
+    Position("midgame-15x15", 15, 15,
+             [(8, 7), (8, 6), (9, 5), (7, 4), (11, 6), (5, 3), (12, 8), (3, 2),
+              (13, 10), (5, 1), (11, 11), (4, 3), (9, 10), (2, 4), (10, 12),
+              (0, 3), (8, 11), (1, 1), (7, 13), (2, 3)]),
+    Position("late-15x15", 15, 15,
+             [(8, 7), (8, 6), (9, 5), (7, 4), (11, 6), (5, 3), (12, 8), (3, 2),
+              (13, 10), (5, 1), (11, 11), (4, 3), (9, 10), (2, 4), (10, 12),
+              (0, 3), (8, 11), (1, 1), (7, 13), (2, 3), (6, 11), (4, 4),
+              (7, 9), (3, 6), (9, 8), (5, 7), (8, 10), (6, 5), (7, 12), (7, 7),
+              (5, 11), (8, 5), (4, 9), (9, 7), (3, 11), (10, 9), (5, 10),
+              (11, 7), (7, 11), (13, 8)]),
+    Position("opening-20x20", 20, 20, [(9, 9)]),
+    Position("midgame-20x20", 20, 20,
+             [(9, 9), (10, 9), (8, 7), (12, 10), (10, 8), (13, 12), (9, 6),
+              (11, 13), (8, 4), (13, 14), (10, 3), (15, 15), (11, 5), (16, 13),
+              (12, 7), (15, 11), (13, 5), (14, 9), (14, 3), (16, 8)]),
+    Position("late-20x20", 20, 20,
+             [(9, 9), (10, 9), (8, 7), (12, 10), (10, 8), (13, 12), (9, 6),
+              (11, 13), (8, 4), (13, 14), (10, 3), (15, 15), (11, 5), (16, 13),
+              (12, 7), (15, 11), (13, 5), (14, 9), (14, 3), (16, 8), (16, 2),
+              (17, 10), (18, 3), (19, 9), (19, 5), (18, 11), (18, 7), (19, 13),
+              (17, 9), (17, 14), (19, 8), (19, 15), (18, 6), (18, 13), (17, 4),
+              (17, 11), (15, 5), (19, 12), (13, 6), (17, 13)]),
+]
+
+CORPORA = OrderedDict([("standard", CORPUS), ("large", LARGE_CORPUS)])
+
+PLAYERS = OrderedDict([
+    ("Minimax", (MinimaxPlayer, 3)),
+    ("AlphaBeta", (AlphaBetaPlayer, 5)),
+])
+
+SCORE_FUNCTIONS = OrderedDict([
+    ("custom_score", custom_score),
+    ("custom_score_2", custom_score_2),
+    ("custom_score_3", custom_score_3),
+    ("improved_score", improved_score),
+    ("center_score", center_score),
+])
+
+
+def timer(time_limit):
+    """Return a `time_left` callable in the same format as `Board.play()`. """
+    time_millis = lambda: 1000 * timeit.default_timer()
+    move_start = time_millis()
+    return lambda: time_limit - (time_millis() - move_start)
+
+
+def iterative_deepening(player, game, max_depth, time_limit):
+    """Search `game` to increasing depths until `max_depth` is reached or the
+    time limit expires.
+
+    Returns
+    -------
+    list<(int, float, int, int)>
+        The depth, cumulative elapsed milliseconds, nodes and evaluations of
+        every completed iteration.
+    """
+    if isinstance(player, AlphaBetaPlayer):
+        search = player.alphabeta
+    else:
+        search = player.minimax
+
+    random.seed(SEED)
+    player.time_left = timer(time_limit)
+    start = timeit.default_timer()
+    completed = []
+    try:
+        for depth in range(1, max_depth + 1):
+            player.stats = SearchStats()
+            search(game, depth)
+            # minimax() returns a partial result when the timer expires
+            if player.time_left() < player.TIMER_THRESHOLD:
+                break
+            elapsed = 1000 * (timeit.default_timer() - start)
+            completed.append((depth, elapsed, player.stats.nodes,
+                              player.stats.evaluations))
+    except SearchTimeout:
+        pass
+    return completed
+
+
+def benchmark(position, player_name, score_name, time_limit=TIME_LIMIT):
+    """Collect the benchmark metrics for a single configuration. """
+    player_cls, fixed_depth = PLAYERS[player_name]
+    player = player_cls(score_fn=SCORE_FUNCTIONS[score_name])
+    game = setup_board(position)
+
+    iterations = iterative_deepening(player, game, fixed_depth, float("inf"))
+    depth, elapsed, nodes, evaluations = iterations[-1]
+    last_elapsed = elapsed - (iterations[-2][1] if len(iterations) > 1 else 0)
+
+    budget = iterative_deepening(player, game, len(game.get_blank_spaces()),
+                                 time_limit)
+    return OrderedDict([
+        ("player", player_name),
+        ("score_fn", score_name),
+        ("position", position.name),
+        ("depth", depth),
+        ("time_to_depth_ms", elapsed),
+        ("nodes", nodes),
+        ("evaluations", evaluations),
+        ("evals_per_sec", 1000 * evaluations / last_elapsed
+         if last_elapsed else 0.),
+        ("depth_at_limit", budget[-1][0] if budget else 0),
+    ])
+
+
+def summarize(results):
+    """Aggregate the per-position results of each player and score function.
+    """
+    summary = OrderedDict()
+    for row in results:
+        key = (row["player"], row["score_fn"])
+        total = summary.setdefault(key, OrderedDict([
+            ("time_to_depth_ms", 0.), ("nodes", 0), ("evaluations", 0),
+            ("evals_per_sec", 0.), ("depth_at_limit", 0.), ("positions", 0)]))
+        for field in ("time_to_depth_ms", "nodes", "evaluations",
+                      "evals_per_sec", "depth_at_limit"):
+            total[field] += row[field]
+        total["positions"] += 1
+    for total in summary.values():
+        total["evals_per_sec"] /= total["positions"]
+        total["depth_at_limit"] /= total["positions"]
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    """Print one line per player and score function, followed by the change
+    relative to a baseline summary if one is supplied.
+    """
+    print("{:<11}{:<16}{:>12}{:>10}{:>10}{:>12}{:>10}".format(
+        "Player", "Score", "TTD (ms)", "Nodes", "Evals", "Evals/sec",
+        "Depth@TL"))
+    for (player, score), total in summary.items():
+        line = "{:<11}{:<16}{:>12.1f}{:>10}{:>10}{:>12.0f}{:>10.2f}".format(
+            player, score, total["time_to_depth_ms"], total["nodes"],
+            total["evaluations"], total["evals_per_sec"],
+            total["depth_at_limit"])
+        previous = baseline.get((player, score)) if baseline else None
+        if previous:
+            line += "   TTD x{:.2f}, evals/sec x{:.2f}, depth {:+.2f}".format(
+                total["time_to_depth_ms"] / previous["time_to_depth_ms"],
+                total["evals_per_sec"] / (previous["evals_per_sec"] or 1.),
+                total["depth_at_limit"] - previous["depth_at_limit"])
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--player", action="append", choices=list(PLAYERS),
+                        help="agent type to benchmark (default: all)")
+    parser.add_argument("--score", action="append",
+                        choices=list(SCORE_FUNCTIONS),
+                        help="score function to benchmark (default: all)")
+    parser.add_argument("--corpus", choices=list(CORPORA), default="standard",
+                        help="positions to benchmark")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT,
+                        help="turn time limit in milliseconds")
+    parser.add_argument("--save", metavar="FILE",
+                        help="write the results to a JSON file")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare against results saved with --save")
+    args = parser.parse_args()
+
+    results = []
+    for player_name in args.player or PLAYERS:
+        for score_name in args.score or SCORE_FUNCTIONS:
+            for position in CORPORA[args.corpus]:
+                results.append(benchmark(position, player_name, score_name,
+                                         args.time_limit))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = summarize(json.load(f)["results"])
+    print_summary(summarize(results), baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"time_limit": args.time_limit, "seed": SEED,
+                       "corpus": args.corpus, "results": results}, f,
+                      indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Generate training positions for learned evaluation functions by self-play.
+
+Games between fixed-depth alpha-beta searchers are played across a pool of
+worker processes.  Every position in which the player to move has a legal
+move is recorded together with the search score and the final outcome of
+the game.  Positions are deduplicated under the symmetries of the board and
+streamed to gzip-compressed shards of bounded size, so that nothing
+accumulates in memory however long the run:
+
+    python selfplay.py --positions 1000000 --out data/ --jobs 8
+
+Moves are made noisy by random openings and by playing a random move instead
+of the searched one with probability `--epsilon`.
+
+Shard format: a header of MAGIC, then the version, board width and height and
+the record size as unsigned bytes, followed by fixed-size records of
+
+    blocked   ceil(width * height / 8) bytes, little-endian occupancy mask
+    active    int16, cell index (row + column * height) of the player to move
+    inactive  int16, cell index of the other player
+    score     float32, search score for the player to move
+    outcome   int8, +1 if the player to move won the game, else -1
+    ply       uint8, number of moves played before the position
+"""
+import argparse
+import gzip
+import os
+import random
+import struct
+import timeit
+
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+
+from agents import AGENTS, agent_arguments
+from game_agent import AlphaBetaPlayer
+from isolation import Board
+from isolation.bitboard import board_bits
+from tournament import random_opening
+
+MAGIC = b"ISOP"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBB")
+FIELDS = struct.Struct("<hhfbB")
+
+SEARCH_DEPTH = 3  # plies searched for every move
+EPSILON = 0.1  # probability of playing a random move
+SHARD_BYTES = 64 * 2 ** 20  # compressed size at which a shard is closed
+DEDUP_SIZE = 2 ** 22  # positions remembered for deduplication
+GAMES_PER_TASK = 8
+
+Record = namedtuple("Record", ["blocked", "active", "inactive", "score",
+                               "outcome", "ply"])
+
+
+def record_size(width, height):
+    return (width * height + 7) // 8 + FIELDS.size
+
+
+def pack_record(width, height, blocked, active, inactive, score, outcome,
+                ply):
+    return (blocked.to_bytes((width * height + 7) // 8, "little") +
+            FIELDS.pack(active, inactive, score, outcome, min(ply, 255)))
+
+
+def unpack_record(data, width, height):
+    size = (width * height + 7) // 8
+    return Record(int.from_bytes(data[:size], "little"),
+                  *FIELDS.unpack(data[size:]))
+
+
+def symmetries(width, height):
+    """Return the cell permutations of the board symmetries that map knight
+    moves to knight moves: the reflections and half turn, plus the quarter
+    turns and diagonal reflections on square boards.
+    """
+    def index(r, c):
+        return r + c * height
+
+    maps = [lambda r, c: (r, c),
+            lambda r, c: (height - 1 - r, c),
+            lambda r, c: (r, width - 1 - c),
+            lambda r, c: (height - 1 - r, width - 1 - c)]
+    if width == height:
+        maps += [lambda r, c: (c, r),
+                 lambda r, c: (width - 1 - c, r),
+                 lambda r, c: (c, height - 1 - r),
+                 lambda r, c: (width - 1 - c, height - 1 - r)]
+    cells = [(r, c) for c in range(width) for r in range(height)]
+    return [[index(*f(r, c)) for r, c in cells] for f in maps]
+
+
+def canonical_key(blocked, active, inactive, perms):
+    """Return the same key for all positions that are equivalent under the
+    board symmetries.
+    """
+    cells = len(perms[0])
+    bits = [idx for idx in range(cells) if blocked >> idx & 1]
+    return min((sum(1 << perm[idx] for idx in bits), perm[active],
+                perm[inactive]) for perm in perms)
+
+
+def play_selfplay_game(score_fn, depth, epsilon, width, height, perms, rng):
+    """Play one noisy self-play game.
+
+    Returns
+    -------
+    list<(tuple, bytes)>
+        The canonical key and packed record of every searched position.
+    """
+    player_1 = AlphaBetaPlayer(search_depth=depth, score_fn=score_fn)
+    player_2 = AlphaBetaPlayer(search_depth=depth, score_fn=score_fn)
+    for player in (player_1, player_2):
+        player.time_left = lambda: float("inf")
+
+    game = Board(player_1, player_2, width, height)
+    for move in random_opening(width, height, rng):
+        game.apply_move(move)
+
+    positions = []
+    while True:
+        moves = game.get_legal_moves()
+        if not moves:
+            break
+        player = game.active_player
+        score, move = player._max_value(game, player, depth, float("-inf"),
+                                        float("inf"))
+        if move == player.NO_MOVE or rng.random() < epsilon:
+            move = rng.choice(moves)
+        positions.append((board_bits(game), score, game.move_count, player))
+        game.apply_move(move)
+
+    loser = game.active_player
+    records = []
+    for (blocked, active, inactive), score, ply, player in positions:
+        outcome = -1 if player is loser else 1
+        records.append((canonical_key(blocked, active, inactive, perms),
+                        pack_record(width, height, blocked, active, inactive,
+                                    score, outcome, ply)))
+    return records
+
+
+def selfplay_task(task):
+    """Play a batch of games in a worker process. """
+    name, depth, epsilon, width, height, seed = task
+    score_fn = agent_arguments(name)[1]["score_fn"]
+    perms = symmetries(width, height)
+    rng = random.Random(seed)
+    records = []
+    for _ in range(GAMES_PER_TASK):
+        records.extend(play_selfplay_game(score_fn, depth, epsilon, width,
+                                          height, perms, rng))
+    return records
+
+
+class Deduplicator:
+    """Remember recently seen position keys in two generations of sets, so
+    that memory stays bounded by `size` keys.
+    """
+
+    def __init__(self, size=DEDUP_SIZE):
+        self.size = size
+        self._current = set()
+        self._previous = set()
+
+    def add(self, key):
+        """Return True if the key was not seen recently. """
+        if key in self._current or key in self._previous:
+            return False
+        if len(self._current) >= self.size // 2:
+            self._previous, self._current = self._current, set()
+        self._current.add(key)
+        return True
+
+
+class ShardWriter:
+    """Write records to numbered gzip shards in `directory`, starting a new
+    shard when the compressed size of the current one reaches `max_bytes`.
+    """
+
+    def __init__(self, directory, width, height, max_bytes=SHARD_BYTES,
+                 prefix="selfplay"):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.shards = 0
+        self.records = 0
+        self._raw = None
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        path = os.path.join(self.directory, "{}-{:05d}.bin.gz".format(
+            self.prefix, self.shards))
+        while os.path.exists(path):
+            self.shards += 1
+            path = os.path.join(self.directory, "{}-{:05d}.bin.gz".format(
+                self.prefix, self.shards))
+        self._raw = open(path, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                                     record_size(self.width, self.height)))
+        self.shards += 1
+
+    def write(self, record):
+        if self._file is None:
+            self._open()
+        self._file.write(record)
+        self.records += 1
+        if self._raw.tell() >= self.max_bytes:
+            self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = self._raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_shard(path):
+    """Generate the Records stored in a shard file. """
+    with gzip.open(path, "rb") as f:
+        magic, version, width, height, size = HEADER.unpack(
+            f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a self-play shard".format(path))
+        while True:
+            data = f.read(size)
+            if len(data) < size:
+                return
+            yield unpack_record(data, width, height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--agent", default="AB_Improved",
+                        choices=[name for name, (cls, kwargs) in AGENTS.items()
+                                 if "score_fn" in kwargs],
+                        help="agent whose score function guides the search")
+    parser.add_argument("-n", "--positions", type=int, default=100000,
+                        help="number of unique positions to write")
+    parser.add_argument("-d", "--depth", type=int, default=SEARCH_DEPTH)
+    parser.add_argument("--epsilon", type=float, default=EPSILON)
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("-o", "--out", default="selfplay",
+                        help="directory of the output shards")
+    parser.add_argument("--shard-mb", type=float,
+                        default=SHARD_BYTES / 2 ** 20)
+    parser.add_argument("--dedup-size", type=int, default=DEDUP_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-j", "--jobs", type=int, default=cpu_count(),
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    seeds = random.Random(args.seed)
+    dedup = Deduplicator(args.dedup_size)
+    seen = 0
+    start = timeit.default_timer()
+    with Pool(args.jobs) as pool, ShardWriter(
+            args.out, args.width, args.height,
+            int(args.shard_mb * 2 ** 20)) as writer:
+        while writer.records < args.positions:
+            # Submit work in bounded batches so that finished games never
+            # queue up in memory
+            tasks = [(args.agent, args.depth, args.epsilon, args.width,
+                      args.height, seeds.getrandbits(64))
+                     for _ in range(4 * args.jobs)]
+            for records in pool.imap_unordered(selfplay_task, tasks):
+                for key, record in records:
+                    seen += 1
+                    if writer.records < args.positions and dedup.add(key):
+                        writer.write(record)
+            elapsed = timeit.default_timer() - start
+            print("\r{} positions written ({} seen) in {} shards, "
+                  "{:.0f}/hour".format(writer.records, seen, writer.shards,
+                                       3600 * writer.records / elapsed),
+                  end="", flush=True)
+    print()
+
+
+if __name__ == "__main__":
+    main()
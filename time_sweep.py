@@ -0,0 +1,188 @@
+"""Measure how the strength of an agent changes with the time budget per move
+by playing matches against an opponent over a grid of time limits.
+
+By default both agents get the same budget at every grid point.  With
+`--reference-time` the opponent keeps a fixed budget while the first agent's
+budget is swept, which shows directly where extra time stops paying off:
+
+    python time_sweep.py AB_Custom AB_Improved --rounds 20 --jobs 8
+    python time_sweep.py AB_Custom AB_Custom --reference-time 150
+
+Each round plays one random opening twice, once with each agent moving
+first.  Games are distributed over a pool of worker processes.
+"""
+import argparse
+import csv
+import math
+
+from multiprocessing import Pool, cpu_count
+
+from agents import AGENTS, make_agent
+from tournament import play_game, random_opening
+
+TIME_LIMITS = [25, 50, 100, 150, 300, 600, 1000, 2000]
+NUM_ROUNDS = 10  # number of openings per time limit
+
+
+class BudgetExceeded(Exception):
+    """Raised when a player runs over its own budget on a board refereed with
+    the larger time limit of its opponent.
+    """
+    pass
+
+
+def limit_budget(player, budget, time_limit):
+    """Restrict `player` to `budget` milliseconds per move in games refereed
+    with the (larger or equal) `time_limit`.
+
+    The player object itself must stay registered on the board, so its
+    get_move() method is wrapped in place.
+    """
+    if budget >= time_limit:
+        return player
+    get_move = player.get_move
+    offset = time_limit - budget
+
+    def budgeted_get_move(game, time_left):
+        own_time_left = lambda: time_left() - offset
+        move = get_move(game, own_time_left)
+        if own_time_left() < 0:
+            raise BudgetExceeded(player)
+        return move
+
+    player.get_move = budgeted_get_move
+    return player
+
+
+def play_task(task):
+    """Play one game in a worker process.
+
+    Returns
+    -------
+    (float, bool, str)
+        The time limit of the first agent, whether the first agent won, and
+        the termination reason.
+    """
+    name_a, name_b, limit_a, limit_b, opening, a_first = task
+    time_limit = max(limit_a, limit_b)
+    player_a = limit_budget(make_agent(name_a), limit_a, time_limit)
+    player_b = limit_budget(make_agent(name_b), limit_b, time_limit)
+    players = (player_a, player_b) if a_first else (player_b, player_a)
+    try:
+        winner, _, termination = play_game(players[0], players[1], opening,
+                                           time_limit=time_limit)
+    except BudgetExceeded as e:
+        return limit_a, e.args[0] is not player_a, "timeout"
+    return limit_a, winner is player_a, termination
+
+
+def make_tasks(name_a, name_b, time_limits, rounds, reference_time=None):
+    """Build the list of games to play: every opening is played twice at
+    every time limit, once with each agent moving first.
+    """
+    tasks = []
+    for _ in range(rounds):
+        opening = random_opening()
+        for limit in time_limits:
+            limit_b = limit if reference_time is None else reference_time
+            for a_first in (True, False):
+                tasks.append((name_a, name_b, limit, limit_b, opening,
+                              a_first))
+    return tasks
+
+
+def elo_difference(score):
+    """Convert an expected score in [0, 1] to an Elo rating difference. """
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return 400 * math.log10(score / (1 - score))
+
+
+def strength_curve(results, time_limits):
+    """Aggregate the game results per time limit.
+
+    Returns
+    -------
+    list<(float, int, int, float, float, float)>
+        The time limit, games played, games won, win rate, 95% confidence
+        half-width of the win rate and Elo difference for each time limit.
+    """
+    curve = []
+    for limit in time_limits:
+        outcomes = [won for l, won, _ in results if l == limit]
+        games = len(outcomes)
+        wins = sum(outcomes)
+        rate = wins / games if games else 0.
+        margin = 1.96 * math.sqrt(rate * (1 - rate) / games) if games else 0.
+        curve.append((limit, games, wins, rate, margin, elo_difference(rate)))
+    return curve
+
+
+def saturation_point(curve):
+    """Return the smallest time limit whose win rate is within the confidence
+    interval of the best win rate on the curve, i.e. the budget beyond which
+    extra time no longer measurably pays off.
+    """
+    best = max(curve, key=lambda point: point[3])
+    for limit, _, _, rate, margin, _ in curve:
+        if rate + margin >= best[3] - best[4]:
+            return limit
+    return best[0]
+
+
+def print_curve(curve, name_a, name_b):
+    print("\n{} vs {}".format(name_a, name_b))
+    print("{:>9}{:>7}{:>6}{:>9}{:>9}{:>8}  {}".format(
+        "Time (ms)", "Games", "Won", "Win %", "+/-", "Elo", ""))
+    for limit, games, wins, rate, margin, elo in curve:
+        print("{:>9g}{:>7}{:>6}{:>8.1f}%{:>8.1f}%{:>8.0f}  {}".format(
+            limit, games, wins, 100 * rate, 100 * margin, elo,
+            "#" * int(round(40 * rate))))
+    print("\nExtra time stops paying off beyond {:g} ms".format(
+        saturation_point(curve)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("agent", choices=list(AGENTS),
+                        help="agent whose strength curve is measured")
+    parser.add_argument("opponent", choices=list(AGENTS))
+    parser.add_argument("-t", "--time-limits", type=float, nargs="+",
+                        default=TIME_LIMITS,
+                        help="time limits in milliseconds")
+    parser.add_argument("-r", "--rounds", type=int, default=NUM_ROUNDS,
+                        help="number of openings per time limit")
+    parser.add_argument("--reference-time", type=float,
+                        help="fixed time limit for the opponent")
+    parser.add_argument("-j", "--jobs", type=int, default=cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--csv", metavar="FILE",
+                        help="write the strength curve to a CSV file")
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.agent, args.opponent, args.time_limits,
+                       args.rounds, args.reference_time)
+    results = []
+    timeouts = 0
+    with Pool(args.jobs) as pool:
+        for result in pool.imap_unordered(play_task, tasks):
+            results.append(result)
+            timeouts += result[2] == "timeout"
+            print("\rPlayed {}/{} games".format(len(results), len(tasks)),
+                  end="", flush=True)
+    print()
+
+    curve = strength_curve(results, args.time_limits)
+    print_curve(curve, args.agent, args.opponent)
+    if timeouts:
+        print("{} games were lost on time".format(timeouts))
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time_limit", "games", "wins", "win_rate",
+                             "margin", "elo"])
+            writer.writerows(curve)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,22 +10,41 @@ The matches are fair because the board is initialized randomly for both
 players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
+
+The games can also be spread over several hosts: a coordinator serves the
+game specs over TCP and collects the results, and any number of workers pull
+games, play them and report back (see work_queue.py).  Games held by a worker
+that crashes or stops answering are handed to another worker.
+
+    python tournament.py --coordinator 0.0.0.0:5000
+    python tournament.py --worker coordinator-host:5000   # on every host
+
+With `--store PATH` every finished game is saved to a SQLite file, and a
+tournament interrupted by a crash or Ctrl-C resumes from it (see
+results_store.py).
 """
+import argparse
 import itertools
+import os
 import random
+import subprocess
+import sys
 import warnings
 
 from collections import namedtuple
 
+from agents import AGENTS, make_agent
 from isolation import Board
-from sample_players import (RandomPlayer, open_move_score,
-                            improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
-                        custom_score_2, custom_score_3)
+from results_store import ResultStore
+from work_queue import Coordinator, JobFailed, parse_address, work
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
 
+TEST_AGENTS = ["AB_Improved", "AB_Custom", "AB_Custom_2", "AB_Custom_3"]
+CPU_AGENTS = ["Random", "MM_Open", "MM_Center", "MM_Improved", "AB_Open",
+              "AB_Center", "AB_Improved"]
+
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
 function against a baseline agent using alpha-beta search and iterative
@@ -37,6 +56,173 @@ game_agent.py.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
+class GameSpec(namedtuple("GameSpec", ["match", "cpu_agent", "test_agent",
+                                       "test_first", "opening",
+                                       "time_limit"])):
+    """A single tournament game between two registered agents (see
+    agents.py), identified by name so that it can be played in another
+    process.
+    """
+    __slots__ = ()
+
+    @property
+    def players(self):
+        """The names of the first and second player. """
+        if self.test_first:
+            return self.test_agent, self.cpu_agent
+        return self.cpu_agent, self.test_agent
+
+
+GameResult = namedtuple("GameResult", ["spec", "test_won", "termination",
+                                       "history"])
+
+
+def random_opening(width=7, height=7, rng=random):
+    """Return a random move and response to initialize a game. """
+    game = Board("Player1", "Player2", width=width, height=height)
+    opening = []
+    for _ in range(2):
+        move = rng.choice(game.get_legal_moves())
+        game.apply_move(move)
+        opening.append(move)
+    return opening
+
+
+def play_game(player_1, player_2, opening, time_limit=TIME_LIMIT, width=7,
+              height=7):
+    """Play a single game from the given opening moves.
+
+    Returns
+    -------
+    (object, list<[int, int]>, str)
+        The winning player, the move history after the opening and the
+        termination reason, as returned by `Board.play()`.
+    """
+    game = Board(player_1, player_2, width=width, height=height)
+    for move in opening:
+        game.apply_move(move)
+    return game.play(time_limit=time_limit)
+
+
+def play_spec(spec, width=7, height=7):
+    """Play the game described by a GameSpec in this process.
+
+    Returns
+    -------
+    GameResult
+    """
+    players = [make_agent(name) for name in spec.players]
+    opening = [tuple(move) for move in spec.opening]
+    winner, history, termination = play_game(
+        players[0], players[1], opening, spec.time_limit, width, height)
+    test_won = winner is players[0 if spec.test_first else 1]
+    return GameResult(spec, test_won, termination, history)
+
+
+def play_remote(job):
+    """Play a game served by the coordinator; the work_queue job handler. """
+    result = play_spec(GameSpec(**job))
+    return {"test_won": result.test_won, "termination": result.termination,
+            "history": result.history}
+
+
+def print_progress(count, total, result):
+    spec = result.spec
+    winner = spec.test_agent if result.test_won else spec.cpu_agent
+    print("[{:>4}/{}] {} vs {}: {} wins ({})".format(
+        count, total, *spec.players, winner, result.termination), flush=True)
+
+
+def stored_results(specs, store):
+    """Split the specs into the results found in a ResultStore and the specs
+    of the games that still have to be played.
+    """
+    results = []
+    remaining = []
+    for spec in specs:
+        stored = store.get(spec) if store is not None else None
+        if stored is None:
+            remaining.append(spec)
+        else:
+            results.append(GameResult(spec, *stored))
+    return results, remaining
+
+
+def run_local(specs, store=None):
+    """Play the games one after the other in this process, skipping those
+    already in the store and storing every game as soon as it finishes.
+
+    Returns
+    -------
+    list<GameResult>
+    """
+    results, remaining = stored_results(specs, store)
+    if results:
+        print("Resuming: {} of {} games found in {}".format(
+            len(results), len(specs), store.path), flush=True)
+    for spec in remaining:
+        result = play_spec(spec)
+        if store is not None:
+            store.put(result)
+        results.append(result)
+        print_progress(len(results), len(specs), result)
+    return results
+
+
+def run_coordinator(specs, address, local_workers=0, store=None):
+    """Serve the games to workers and collect the results.
+
+    Parameters
+    ----------
+    specs : list<GameSpec>
+        The games to play.
+
+    address : (str, int)
+        The host and port to listen on.
+
+    local_workers : int (optional)
+        The number of worker processes to start on this host.
+
+    store : ResultStore (optional)
+        Games found in the store are not served again, and every game is
+        stored as soon as its result arrives.
+
+    Returns
+    -------
+    list<GameResult>
+        The results of the games that were played, in order of completion.
+    """
+    results, remaining = stored_results(specs, store)
+    coordinator = Coordinator([spec._asdict() for spec in remaining],
+                              address)
+    host, port = coordinator.address[:2]
+    print("Serving {} of {} games on {}:{}".format(
+        len(remaining), len(specs), host, port), flush=True)
+    worker_address = "{}:{}".format(
+        "localhost" if host in ("", "0.0.0.0") else host, port)
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                                 "--worker", worker_address])
+               for _ in range(local_workers)]
+
+    try:
+        for job_id, outcome in coordinator.results():
+            spec = remaining[job_id]
+            if isinstance(outcome, JobFailed):
+                print("{} vs {}: lost ({})".format(*spec.players, outcome),
+                      flush=True)
+                continue
+            result = GameResult(spec, outcome["test_won"],
+                                outcome["termination"], outcome["history"])
+            if store is not None:
+                store.put(result)
+            results.append(result)
+            print_progress(len(results), len(specs), result)
+    finally:
+        for worker in workers:
+            worker.wait()
+    return results
+
+
 def play_round(cpu_agent, test_agents, win_counts, num_matches):
     """Compare the test agents to the cpu agent in "fair" matches.
 
@@ -53,8 +239,7 @@ def play_round(cpu_agent, test_agents, win_counts, num_matches):
                     for agent in test_agents], [])
 
         # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
+        for move in random_opening():
             for game in games:
                 game.apply_move(move)
 
@@ -71,6 +256,59 @@ def play_round(cpu_agent, test_agents, win_counts, num_matches):
     return timeout_count, forfeit_count
 
 
+def schedule_matches(cpu_names, test_names, num_matches,
+                     time_limit=TIME_LIMIT, seed=None):
+    """Return the GameSpecs of the "fair" matches played by play_matches():
+    every test agent plays every cpu agent from the same random openings,
+    once as the first and once as the second player.
+
+    With a seed, the opening of every match depends only on the seed, the
+    cpu agent and the match number, so the same games are scheduled when
+    agents are added to or removed from the tournament.
+    """
+    specs = []
+    for cpu_name in cpu_names:
+        for match in range(num_matches):
+            if seed is None:
+                opening = random_opening()
+            else:
+                opening = random_opening(rng=random.Random(
+                    "{}:{}:{}".format(seed, cpu_name, match)))
+            for test_name in test_names:
+                for test_first in (False, True):
+                    specs.append(GameSpec(match, cpu_name, test_name,
+                                          test_first, opening, time_limit))
+    return specs
+
+
+def print_results(cpu_names, test_names, results):
+    """Print the table of play_matches() for a list of GameResults. """
+    wins = {}
+    games = {}
+    for result in results:
+        key = (result.spec.cpu_agent, result.spec.test_agent)
+        wins[key] = wins.get(key, 0) + result.test_won
+        games[key] = games.get(key, 0) + 1
+
+    header = "{:^9}{:^13}" + "{:^13}" * len(test_names)
+    row = "{!s:^9}{:^13}" + " {:^5}| {:^5}" * len(test_names)
+    print(header.format("Match #", "Opponent", *test_names))
+    print(row.format("", "", *(["Won", "Lost"] * len(test_names))))
+    for idx, cpu_name in enumerate(cpu_names):
+        totals = sum([[wins.get((cpu_name, name), 0),
+                       games.get((cpu_name, name), 0) -
+                       wins.get((cpu_name, name), 0)]
+                      for name in test_names], [])
+        print(row.format(idx + 1, cpu_name, *totals))
+    print("-" * (22 + 13 * len(test_names)))
+    rates = []
+    for name in test_names:
+        won = sum(wins.get((cpu, name), 0) for cpu in cpu_names)
+        played = sum(games.get((cpu, name), 0) for cpu in cpu_names)
+        rates.append("{:.1f}%".format(100 * won / played if played else 0.))
+    print(header.format("", "Win Rate:", *rates) + "\n")
+
+
 def update(total_wins, wins):
     for player in total_wins:
         total_wins[player] += wins[player]
@@ -127,26 +365,67 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
 
 def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--coordinator", metavar="[HOST:]PORT",
+                        help="serve the tournament games to workers")
+    parser.add_argument("--worker", metavar="HOST:PORT",
+                        help="play games served by a coordinator")
+    parser.add_argument("--local-workers", type=int, default=0,
+                        help="worker processes started by the coordinator")
+    parser.add_argument("-r", "--rounds", type=int, default=NUM_MATCHES,
+                        help="number of matches against each opponent")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    parser.add_argument("--test-agents", nargs="+", choices=list(AGENTS),
+                        default=TEST_AGENTS)
+    parser.add_argument("--cpu-agents", nargs="+", choices=list(AGENTS),
+                        default=CPU_AGENTS)
+    parser.add_argument("--store", metavar="PATH",
+                        help="SQLite file of finished games; a tournament "
+                        "run again with the same store resumes")
+    parser.add_argument("--seed", default=None,
+                        help="seed for the openings (default 0 with --store)")
+    args = parser.parse_args()
+
+    if args.worker:
+        try:
+            work(parse_address(args.worker), play_remote)
+        except ConnectionError as e:
+            sys.exit("error: {}".format(e))
+        return
+    if args.coordinator or args.store:
+        seed = args.seed
+        if seed is None and args.store:
+            seed = "0"
+        specs = schedule_matches(args.cpu_agents, args.test_agents,
+                                 args.rounds, args.time_limit, seed)
+        store = ResultStore(args.store) if args.store else None
+        try:
+            if args.coordinator:
+                results = run_coordinator(
+                    specs, parse_address(args.coordinator),
+                    args.local_workers, store)
+            else:
+                results = run_local(specs, store)
+        finally:
+            if store is not None:
+                store.close()
+        print()
+        print_results(args.cpu_agents, args.test_agents, results)
+        timeouts = sum(r.termination == "timeout" for r in results)
+        if timeouts:
+            print("There were {} timeouts during the tournament.".format(
+                timeouts))
+        if len(results) < len(specs):
+            print("{} games were lost and not played.".format(
+                len(specs) - len(results)))
+        return
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
-    test_agents = [
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_2), "AB_Custom_2"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_3), "AB_Custom_3")
-    ]
+    test_agents = [Agent(make_agent(name), name) for name in TEST_AGENTS]
 
     # Define a collection of agents to compete against the test agents
-    cpu_agents = [
-        Agent(RandomPlayer(), "Random"),
-        Agent(MinimaxPlayer(score_fn=open_move_score), "MM_Open"),
-        Agent(MinimaxPlayer(score_fn=center_score), "MM_Center"),
-        Agent(MinimaxPlayer(score_fn=improved_score), "MM_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=open_move_score), "AB_Open"),
-        Agent(AlphaBetaPlayer(score_fn=center_score), "AB_Center"),
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
-    ]
+    cpu_agents = [Agent(make_agent(name), name) for name in CPU_AGENTS]
 
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
@@ -0,0 +1,215 @@
+"""Tune the constants of the custom score functions with SPSA (simultaneous
+perturbation stochastic approximation).
+
+Every iteration perturbs all parameters at once in a random direction,
+plays a batch of fast games between alpha-beta agents using the two
+perturbed parameter sets, and moves the parameters along the direction in
+proportion to the difference in their scores.  Two batches of games per
+iteration are enough however many parameters are tuned, which makes SPSA
+far cheaper than tuning one constant at a time with tournament.py.
+
+    python tune.py custom_score --iterations 200 --games 32 --jobs 8
+
+Progress is written to a JSON checkpoint after every iteration, and a run
+started with an existing checkpoint continues from it.
+"""
+import argparse
+import inspect
+import json
+import os
+import random
+
+from collections import OrderedDict, namedtuple
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+from game_agent import AlphaBetaPlayer, custom_score, custom_score_3
+from isolation import Board
+from isolation.geometry import geometry
+from tournament import random_opening
+
+Parameter = namedtuple("Parameter", ["default", "lower", "upper"])
+
+
+def parameters(function, ranges):
+    """Return the Parameters of a score function, with the ranges given and
+    the defaults of its signature, so that tuning starts from the shipped
+    values.  A default of None stands for the average game length of the
+    board size, and tuning games are played on the standard board.
+    """
+    signature = inspect.signature(function)
+    params = OrderedDict()
+    for name, (lower, upper) in ranges:
+        default = signature.parameters[name].default
+        if default is None:
+            default = geometry(7, 7).average_moves
+        params[name] = Parameter(default, lower, upper)
+    return params
+
+
+# Tunable keyword parameters of the score functions and their ranges
+TUNABLE = OrderedDict([
+    ("custom_score", (custom_score, parameters(custom_score, [
+        ("aggressiveness", (0., 4.)),
+        ("aggressiveness_moves", (5., 100.)),
+        ("deep_switch", (0., 1.)),
+    ]))),
+    ("custom_score_3", (custom_score_3, parameters(custom_score_3, [
+        ("border_discount", (0., 2.)),
+        ("average_moves", (5., 100.)),
+    ]))),
+])
+
+TIME_LIMIT = 25  # milliseconds per move in tuning games
+GAMES = 16  # games per iteration, half with each perturbed parameter set
+
+# SPSA gains for parameters normalized to [0, 1]: the perturbation size is
+# C / k^GAMMA and the step size A / (k + STABILITY)^ALPHA
+A = 0.05
+C = 0.1
+ALPHA = 0.602
+GAMMA = 0.101
+STABILITY = 10
+
+
+def score_function(name, values):
+    """Return the score function `name` with its parameters bound to
+    `values`; partial objects of module functions can be sent to worker
+    processes.
+    """
+    function, _ = TUNABLE[name]
+    return partial(function, **values)
+
+
+def denormalize(params, theta):
+    return OrderedDict(
+        (name, p.lower + min(max(t, 0.), 1.) * (p.upper - p.lower))
+        for (name, p), t in zip(params.items(), theta))
+
+
+def normalize(params, values):
+    return [(values[name] - p.lower) / (p.upper - p.lower)
+            for name, p in params.items()]
+
+
+def play_task(task):
+    """Play one game between two parameter sets in a worker process.
+
+    Returns
+    -------
+    bool
+        Whether the first parameter set won.
+    """
+    name, values_a, values_b, opening, a_first, time_limit = task
+    player_a = AlphaBetaPlayer(score_fn=score_function(name, values_a))
+    player_b = AlphaBetaPlayer(score_fn=score_function(name, values_b))
+    players = (player_a, player_b) if a_first else (player_b, player_a)
+    game = Board(*players)
+    for move in opening:
+        game.apply_move(move)
+    winner, _, _ = game.play_fast(time_limit=time_limit)
+    return winner is player_a
+
+
+def play_batch(pool, name, values_a, values_b, games, time_limit):
+    """Return the fraction of `games` won by values_a over values_b. Every
+    opening is played twice, once with each parameter set moving first.
+    """
+    tasks = []
+    for _ in range(max(games // 2, 1)):
+        opening = random_opening()
+        for a_first in (True, False):
+            tasks.append((name, values_a, values_b, opening, a_first,
+                          time_limit))
+    wins = sum(pool.imap_unordered(play_task, tasks))
+    return wins / len(tasks)
+
+
+def load_checkpoint(path, name):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        if state["function"] != name:
+            raise ValueError("{} is a checkpoint for {}".format(
+                path, state["function"]))
+        return state
+    _, params = TUNABLE[name]
+    return {"function": name, "iteration": 0,
+            "values": OrderedDict((k, p.default) for k, p in params.items()),
+            "history": []}
+
+
+def save_checkpoint(path, state):
+    """Write the checkpoint atomically, so an interrupted run never leaves a
+    truncated file behind.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def spsa(pool, name, iterations, games, time_limit, checkpoint=None):
+    """Run SPSA iterations, continuing from the checkpoint if it exists.
+
+    Returns
+    -------
+    dict
+        The final state: the tuned values and the history of iterations.
+    """
+    _, params = TUNABLE[name]
+    state = load_checkpoint(checkpoint, name)
+    theta = normalize(params, state["values"])
+    start = state["iteration"]
+    for k in range(start + 1, start + iterations + 1):
+        c_k = C / k ** GAMMA
+        a_k = A / (k + STABILITY) ** ALPHA
+        delta = [random.choice((-1, 1)) for _ in theta]
+        plus = denormalize(params, [t + c_k * d for t, d in zip(theta, delta)])
+        minus = denormalize(params, [t - c_k * d for t, d in zip(theta, delta)])
+
+        # The win rate of plus over minus estimates the slope of the
+        # strength along delta; its expected value is 0.5 with no slope
+        result = play_batch(pool, name, plus, minus, games, time_limit)
+        gradient = (2 * result - 1) / (2 * c_k)
+        theta = [min(max(t + a_k * gradient * d, 0.), 1.)
+                 for t, d in zip(theta, delta)]
+
+        state["iteration"] = k
+        state["values"] = denormalize(params, theta)
+        state["history"].append({"iteration": k, "plus_score": result,
+                                 "values": state["values"]})
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+        print("{:>4} plus won {:5.1f}%  ".format(k, 100 * result) + "  ".join(
+            "{}={:.3f}".format(*item) for item in state["values"].items()),
+            flush=True)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("function", choices=list(TUNABLE),
+                        help="score function whose parameters are tuned")
+    parser.add_argument("-i", "--iterations", type=int, default=100)
+    parser.add_argument("-g", "--games", type=int, default=GAMES,
+                        help="games per iteration")
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    parser.add_argument("--checkpoint", metavar="FILE",
+                        help="JSON file to save and resume progress")
+    parser.add_argument("-j", "--jobs", type=int, default=cpu_count(),
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or "tune_{}.json".format(args.function)
+    with Pool(args.jobs) as pool:
+        state = spsa(pool, args.function, args.iterations, args.games,
+                     args.time_limit, checkpoint)
+
+    print("\nTuned parameters after {} iterations:".format(state["iteration"]))
+    for key, value in state["values"].items():
+        print("  {} = {:.4f}".format(key, value))
+
+
+if __name__ == "__main__":
+    main()
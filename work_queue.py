@@ -0,0 +1,253 @@
+"""Distribute independent jobs from a coordinator to worker processes on
+other hosts over TCP.
+
+The coordinator holds a queue of JSON-serializable job specs.  Workers
+connect, pull one job at a time, run it and send back a JSON-serializable
+result.  A job is leased to one worker at a time; if the worker disconnects
+or does not answer within the lease timeout the job goes back to the queue,
+so games lost with a crashed or unreachable worker are retried elsewhere.
+
+Messages are JSON objects, one per line::
+
+    worker -> coordinator              coordinator -> worker
+    {"type": "request"}                {"type": "job", "id": 3, "spec": ...}
+                                       {"type": "wait", "seconds": 1.0}
+                                       {"type": "done"}
+    {"type": "result", "id": 3,        {"type": "ok"}
+     "result": ...}
+
+There is no authentication: only run a coordinator on a trusted network.
+"""
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from collections import deque
+
+LEASE_TIMEOUT = 600.  # seconds before a job leased to a worker is retried
+MAX_ATTEMPTS = 3  # number of times a job is handed out before giving up
+POLL_INTERVAL = 1.  # seconds a worker waits when no job is available
+CONNECT_TIMEOUT = 300.  # seconds a worker waits for the coordinator to start
+
+
+class JobFailed(Exception):
+    """Raised for a job that was lost more than MAX_ATTEMPTS times. """
+    pass
+
+
+def parse_address(address, default_host=""):
+    """Split "host:port" (or just "port") into a (host, port) tuple. """
+    host, _, port = str(address).rpartition(":")
+    return host or default_host, int(port)
+
+
+class Coordinator:
+    """Serve job specs to workers and collect their results.
+
+    Parameters
+    ----------
+    specs : list
+        The JSON-serializable job specs; a job's id is its index.
+
+    address : (str, int)
+        The host and port to listen on; port 0 picks a free port.
+
+    lease_timeout : float (optional)
+        Seconds a worker may hold a job before it is handed to another one.
+
+    max_attempts : int (optional)
+        Number of times a job is handed out before it is reported as failed.
+    """
+
+    def __init__(self, specs, address, lease_timeout=LEASE_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS):
+        self.specs = list(specs)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._pending = deque(range(len(self.specs)))
+        self._leases = {}  # job id -> lease expiry time
+        self._attempts = [0] * len(self.specs)
+        self._finished = set()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._handle(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingTCPServer(address, Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+
+    @property
+    def done(self):
+        return len(self._finished) == len(self.specs)
+
+    def _lease(self):
+        """Hand out the next pending job, or None. Expired leases are put
+        back into the queue first.
+        """
+        with self._lock:
+            now = time.time()
+            for job_id, expiry in list(self._leases.items()):
+                if expiry < now:
+                    self._release(job_id)
+            while self._pending:
+                job_id = self._pending.popleft()
+                if job_id in self._finished:
+                    continue
+                self._attempts[job_id] += 1
+                self._leases[job_id] = now + self.lease_timeout
+                return job_id
+            return None
+
+    def _release(self, job_id):
+        """Return a lost job to the queue, or fail it. Requires the lock. """
+        del self._leases[job_id]
+        if job_id in self._finished:
+            return
+        if self._attempts[job_id] < self.max_attempts:
+            self._pending.append(job_id)
+        else:
+            self._finished.add(job_id)
+            self._results.put((job_id, JobFailed(
+                "Job {} was lost {} times".format(job_id,
+                                                  self._attempts[job_id]))))
+
+    def _complete(self, job_id, result):
+        with self._lock:
+            self._leases.pop(job_id, None)
+            # A retried job may be answered twice; the first result wins
+            if job_id in self._finished:
+                return
+            self._finished.add(job_id)
+        self._results.put((job_id, result))
+
+    def _handle(self, rfile, wfile):
+        """Serve one worker connection. """
+        leased = set()
+        try:
+            for line in rfile:
+                message = json.loads(line.decode())
+                if message["type"] == "request":
+                    job_id = self._lease()
+                    if job_id is not None:
+                        leased.add(job_id)
+                        reply = {"type": "job", "id": job_id,
+                                 "spec": self.specs[job_id]}
+                    elif self.done:
+                        reply = {"type": "done"}
+                    else:
+                        reply = {"type": "wait", "seconds": POLL_INTERVAL}
+                elif message["type"] == "result":
+                    leased.discard(message["id"])
+                    self._complete(message["id"], message["result"])
+                    reply = {"type": "ok"}
+                else:
+                    break
+                wfile.write((json.dumps(reply) + "\n").encode())
+                wfile.flush()
+        except (OSError, ValueError, KeyError):
+            pass
+        finally:
+            # Jobs held by a worker that went away are retried at once
+            with self._lock:
+                for job_id in leased:
+                    if job_id in self._leases:
+                        self._release(job_id)
+
+    def results(self):
+        """Serve workers until every job has finished.
+
+        Yields
+        ------
+        (int, object)
+            The id of each job and its result (or a JobFailed instance), in
+            order of completion.
+        """
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        try:
+            for _ in range(len(self.specs)):
+                while True:
+                    try:
+                        yield self._results.get(timeout=POLL_INTERVAL)
+                        break
+                    except queue.Empty:
+                        # Expire the leases of workers that stopped answering
+                        with self._lock:
+                            now = time.time()
+                            for job_id, expiry in list(self._leases.items()):
+                                if expiry < now:
+                                    self._release(job_id)
+        finally:
+            # Keep answering "done" briefly so idle workers can exit cleanly
+            time.sleep(POLL_INTERVAL)
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def work(address, handler, retry_interval=POLL_INTERVAL,
+         connect_timeout=CONNECT_TIMEOUT):
+    """Pull jobs from a coordinator and run them until it reports that all
+    jobs are done.
+
+    Parameters
+    ----------
+    address : (str, int)
+        The coordinator's host and port.
+
+    handler : callable
+        Called with each job spec; returns the JSON-serializable result.
+
+    connect_timeout : float (optional)
+        Seconds to keep retrying before the first job is completed, e.g.
+        while the coordinator is starting, before raising ConnectionError.
+
+    Returns
+    -------
+    int
+        The number of jobs completed by this worker.
+    """
+    completed = 0
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            with socket.create_connection(address) as sock:
+                rfile = sock.makefile("rb")
+                wfile = sock.makefile("wb")
+
+                def call(message):
+                    wfile.write((json.dumps(message) + "\n").encode())
+                    wfile.flush()
+                    line = rfile.readline()
+                    if not line:
+                        raise ConnectionError("coordinator closed connection")
+                    return json.loads(line.decode())
+
+                while True:
+                    reply = call({"type": "request"})
+                    if reply["type"] == "done":
+                        return completed
+                    if reply["type"] == "wait":
+                        time.sleep(reply["seconds"])
+                        continue
+                    result = handler(reply["spec"])
+                    call({"type": "result", "id": reply["id"],
+                          "result": result})
+                    completed += 1
+        except OSError:
+            # The coordinator is not up yet, restarted or has finished
+            if completed:
+                return completed
+            if time.monotonic() >= deadline:
+                raise ConnectionError(
+                    "no coordinator at {}:{} after {:g} seconds".format(
+                        address[0], address[1], connect_timeout))
+            time.sleep(retry_interval)